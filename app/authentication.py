@@ -32,30 +32,21 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 # -------------------------------
 # Current User Retrieval
 # -------------------------------
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
+def get_user_from_token(db: Session, token: str):
+    """The user a bearer token belongs to, or None if the token is invalid."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         role: str = payload.get("role")  # ✅ NEW LINE
-
-        if not email:
-            raise credentials_exception
-
     except JWTError:
-        raise credentials_exception
+        return None
+
+    if not email:
+        return None
 
     user = get_user_by_email(db, email)
     if not user:
-        raise credentials_exception
+        return None
 
     # ✅ Sync role from token (if present)
     if role:
@@ -63,6 +54,19 @@ def get_current_user(
 
     return user
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    user = get_user_from_token(db, token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
 def get_current_admin_user(user: User = Depends(get_current_user)) -> User:
     if user.role != "admin":
         raise HTTPException(
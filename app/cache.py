@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.cache import CacheVersion
+
+
+def get_version(db: Session, name: str) -> int:
+    version = db.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+
+def get_versions(db: Session, names) -> tuple:
+    """Versions of several datasets in one query, in the order of `names`."""
+    rows = dict(db.query(CacheVersion.name, CacheVersion.version).filter(CacheVersion.name.in_(names)))
+    return tuple(rows.get(name) or 0 for name in names)
+
+
+def bump_version(db: Session, name: str):
+    """Mark the cached dataset `name` as changed. Runs in the caller's transaction (no commit)."""
+    bump_versions(db, [name])
+
+
+def bump_versions(db: Session, names):
+    """bump_version() for several datasets, with one UPDATE for the rows that exist."""
+    names = sorted(set(names))  # same lock order in every transaction
+    increment = {CacheVersion.version: CacheVersion.version + 1}
+    updated = (
+        db.query(CacheVersion)
+        .filter(CacheVersion.name.in_(names))
+        .update(increment, synchronize_session=False)
+    )
+    if updated == len(names):
+        return
+    existing = {name for (name,) in db.query(CacheVersion.name).filter(CacheVersion.name.in_(names))}
+    for name in names:
+        if name in existing:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(CacheVersion(name=name, version=1))
+        except IntegrityError:
+            # another worker created the row first
+            db.query(CacheVersion).filter(CacheVersion.name == name).update(increment, synchronize_session=False)
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
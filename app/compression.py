@@ -0,0 +1,238 @@
+"""
+Response compression.
+
+CompressionMiddleware gzip- or brotli-encodes responses whose content type
+is on an allowlist and whose body is at least `minimum_size` bytes, for
+clients that accept it. Streamed bodies (every body is one behind
+BaseHTTPMiddleware) are buffered until `minimum_size` bytes or the last
+chunk arrive before deciding. Responses that already carry
+Content-Encoding or vary on Accept-Encoding have negotiated their own
+encoding and pass through untouched. That is how cached routes serve a
+PrecompressedBody: the compressed bytes are built once per cache entry
+instead of per request.
+
+Brotli is used when the optional `brotli` package is installed and the
+client prefers it; gzip otherwise.
+"""
+import threading
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # a good speed/ratio trade-off for on-the-fly compression
+
+# text/event-stream is deliberately absent: compressing SSE would buffer events
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/csv",
+    "text/css",
+    "text/html",
+    "text/plain",
+})
+
+
+def negotiate(accept_encoding: str):
+    """Best supported encoding in an Accept-Encoding header: "br", "gzip" or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def add_vary(headers: MutableHeaders, name: str):
+    """Add `name` to Vary unless it is already listed."""
+    existing = {v.strip().lower() for v in headers.get("vary", "").split(",")}
+    if name.lower() not in existing:
+        headers.add_vary_header(name)
+
+
+def _varies_on_encoding(headers) -> bool:
+    return "accept-encoding" in {v.strip().lower() for v in headers.get("vary", "").split(",")}
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        """Compressed bytes for `data`, flushed so the client can decode them right away."""
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if last else self._compressor.flush())
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class PrecompressedBody:
+    """
+    A response body to keep in a cache: the plain bytes plus each encoding,
+    built the first time a client asks for it.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = self._encoded[encoding] = compress(self.body, encoding)
+        return data
+
+    def response(self, accept_encoding: str, headers: dict = None, status_code: int = 200) -> Response:
+        headers = dict(headers or {})
+        encoding = negotiate(accept_encoding) if len(self.body) >= MINIMUM_SIZE else None
+        if encoding is None:
+            response = Response(self.body, status_code=status_code, media_type=self.media_type, headers=headers)
+        else:
+            headers["Content-Encoding"] = encoding
+            response = Response(
+                self.encoded(encoding), status_code=status_code, media_type=self.media_type, headers=headers,
+            )
+        # also tells CompressionMiddleware the encoding is already settled
+        add_vary(response.headers, "Accept-Encoding")
+        return response
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE, content_types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(self, encoding, send))
+
+
+class _CompressingSender:
+    """
+    Wraps `send` for one response. The start message is held back until
+    enough of the body has arrived to decide whether to compress.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.buffer = []
+        self.buffered = 0
+        self.compressor = None
+        self.passthrough = False
+
+    def _eligible_headers(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers or _varies_on_encoding(headers):
+            return False
+        if self.start["status"] in (204, 304):
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return media_type in self.middleware.content_types
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not self._eligible_headers(MutableHeaders(raw=message["headers"])):
+                self.passthrough = True
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            await self.send({
+                "type": "http.response.body",
+                "body": self.compressor.chunk(body, last=not more_body),
+                "more_body": more_body,
+            })
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and self.buffered < self.middleware.minimum_size:
+            return  # not enough to decide yet
+        body = b"".join(self.buffer)
+        self.buffer = []
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        if len(body) < self.middleware.minimum_size:
+            # the whole body arrived and is too small to be worth it
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        add_vary(headers, "Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # the compressed bytes differ, so the validator can only be weak
+            headers["ETag"] = "W/" + etag
+
+        if not more_body:
+            body = compress(body, self.encoding)
+            headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        # streamed response: compress chunk by chunk
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        self.compressor = _StreamCompressor(self.encoding)
+        await self.send(self.start)
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compressor.chunk(body, last=False),
+            "more_body": True,
+        })
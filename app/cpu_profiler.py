@@ -0,0 +1,184 @@
+"""
+Statistical CPU profiling for a running worker.
+
+StackSampler wakes up every `interval` seconds, reads every thread's
+current Python stack with sys._current_frames() and counts identical
+stacks. Nothing is traced between samples, so the overhead is one stack
+walk per thread per interval. That makes it safe to run against a
+production worker. The result is in the collapsed-stack format, one
+`thread;outer;...;inner count` line per stack, which flamegraph.pl,
+speedscope and inferno read as is.
+
+Two entry points use it:
+
+- GET /api/v1/admin/profile/cpu?seconds=10 (admin only) samples the
+  worker that serves the request.
+- ProfileRequestMiddleware profiles a single request. Send
+  `X-Profile: <PROFILE_TOKEN>` and the response body is replaced by the
+  collapsed stacks of the threads that ran the route's endpoint and its
+  dependencies.
+
+cProfile would only see the event loop thread here: on 3.11 a profiler
+hooks just the thread that enables it, while sync endpoints run in the
+threadpool. Sampling sees every thread.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+
+MAX_SECONDS = 60
+DEFAULT_INTERVAL = 0.005
+REQUEST_INTERVAL = 0.001
+
+# X-Profile header value that enables per-request profiling; disabled when unset
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+# a thread whose innermost frame is in one of these modules is blocked, not using CPU
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "socket.py", "ssl.py")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_filename.endswith(_IDLE_MODULES)
+
+
+class StackSampler:
+    """
+    Samples other threads' stacks in a background thread until stop().
+    `keep(frames)` can restrict which stacks are counted; it gets the
+    frames innermost first. Threads in `exclude` are skipped.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, include_idle: bool = False, keep=None, exclude=()):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.keep = keep
+        self.exclude = set(exclude)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        own = self.exclude | {threading.get_ident()}
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in own:
+                    continue
+                if not self.include_idle and _is_idle(frame):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                if self.keep is not None and not self.keep(frames):
+                    continue
+                name = names.get(thread_id)
+                if name is None:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    name = names.get(thread_id, str(thread_id))
+                stack = ";".join([name.replace(";", ":")] + [_frame_name(f) for f in reversed(frames)])
+                self.stacks[stack] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+
+def sample(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False) -> StackSampler:
+    """Sample this process for `seconds`; one run at a time. Raises RuntimeError when busy."""
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running in this worker")
+    try:
+        # the calling thread only sleeps here
+        sampler = StackSampler(interval, include_idle, exclude={threading.get_ident()}).start()
+        time.sleep(min(seconds, MAX_SECONDS))
+        return sampler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def _route_code_objects(route) -> set:
+    """Code objects of the endpoint and every dependency FastAPI will call for it."""
+    codes = set()
+    pending = [route.dependant]
+    while pending:
+        dependant = pending.pop()
+        code = getattr(dependant.call, "__code__", None)
+        if code is not None:
+            codes.add(code)
+        pending.extend(dependant.dependencies)
+    return codes
+
+
+class ProfileRequestMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_TOKEN:
+            await self.app(scope, receive, send)
+            return
+        token = Headers(scope=scope).get("x-profile")
+        if not token or not hmac.compare_digest(token, PROFILE_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        codes = None
+
+        def keep(frames):
+            # concurrent requests to the same route are counted too
+            nonlocal codes
+            if codes is None:
+                route = scope.get("route")
+                if route is None or not hasattr(route, "dependant"):
+                    return False
+                codes = _route_code_objects(route)
+            return any(f.f_code in codes for f in frames)
+
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler = StackSampler(REQUEST_INTERVAL, keep=keep).start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+
+        response = PlainTextResponse(sampler.collapsed(), headers={
+            "X-Profiled-Status": str(status),
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Duration-Ms": f"{elapsed * 1000:.1f}",
+            "Cache-Control": "no-store",
+        })
+        await response(scope, receive, send)
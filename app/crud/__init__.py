@@ -4,3 +4,4 @@ from . import product
 from .product import create_product, get_products
 
 from . import order
+from . import wishlist
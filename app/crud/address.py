@@ -1,13 +1,99 @@
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app import models
 from app.schemas import address as address_schema
 
-def create_address(db: Session, address: address_schema.AddressCreate):
-    db_address = models.Address(**address.dict())
+Address = models.Address
+
+# copied onto an order at checkout
+SNAPSHOT_FIELDS = ("name", "line1", "line2", "city", "state", "postal_code", "country", "phone")
+
+class AddressInUse(ValueError):
+    pass
+
+def _set_default(db: Session, user_id: int, address_id: int):
+    """
+    Make `address_id` the user's only default in one UPDATE: the new default
+    is set and the previous one cleared atomically. Doesn't commit.
+    """
+    db.execute(
+        update(Address)
+        .where(Address.user_id == user_id, or_(Address.default.is_(True), Address.id == address_id))
+        .values(default=case((Address.id == address_id, True), else_=False))
+        .execution_options(synchronize_session=False)
+    )
+
+def create_address(db: Session, user_id: int, address: address_schema.AddressCreate):
+    data = address.dict()
+    make_default = data.pop("default") or get_default_address(db, user_id) is None
+    db_address = Address(**data, user_id=user_id, default=False)
     db.add(db_address)
+    db.flush()
+    if make_default:
+        _set_default(db, user_id, db_address.id)
+    db.commit()
+    db.refresh(db_address)
+    return db_address
+
+def get_addresses(db: Session, user_id: int):
+    return (
+        db.query(Address)
+        .filter(Address.user_id == user_id)
+        .order_by(Address.default.desc(), Address.id)
+        .all()
+    )
+
+def get_address(db: Session, user_id: int, address_id: int):
+    return db.query(Address).filter(Address.id == address_id, Address.user_id == user_id).first()
+
+def get_default_address(db: Session, user_id: int):
+    return db.query(Address).filter(Address.user_id == user_id, Address.default.is_(True)).first()
+
+def update_address(db: Session, user_id: int, address_id: int, changes: address_schema.AddressUpdate):
+    db_address = get_address(db, user_id, address_id)
+    if db_address is None:
+        return None
+    for field, value in changes.dict(exclude_unset=True).items():
+        setattr(db_address, field, value)
     db.commit()
     db.refresh(db_address)
     return db_address
 
-def get_addresses(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Address).offset(skip).limit(limit).all()
+def set_default_address(db: Session, user_id: int, address_id: int):
+    if get_address(db, user_id, address_id) is None:
+        return None
+    _set_default(db, user_id, address_id)
+    db.commit()
+    return get_address(db, user_id, address_id)
+
+def snapshot(address) -> dict:
+    return {field: getattr(address, field) for field in SNAPSHOT_FIELDS}
+
+def delete_address(db: Session, user_id: int, address_id: int):
+    """
+    Deletes the address; when it was the default, the user's oldest remaining
+    address becomes the default. Raises AddressInUse if the database still
+    refuses because orders reference it (tables created before those
+    references became ON DELETE SET NULL).
+    """
+    db_address = get_address(db, user_id, address_id)
+    if db_address is None:
+        return False
+    was_default = db_address.default
+    try:
+        db.query(Address).filter(Address.id == address_id).delete(synchronize_session=False)
+        if was_default:
+            replacement = (
+                db.query(Address.id)
+                .filter(Address.user_id == user_id)
+                .order_by(Address.id)
+                .first()
+            )
+            if replacement is not None:
+                _set_default(db, user_id, replacement.id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise AddressInUse("Address is used by existing orders")
+    return True
@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.jobs import job_handler
+from app.models.analytics import DailyOrderStats, DailyCategorySales, RollupWatermark
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+
+# Rows younger than this are left for the next run, so a transaction that
+# committed late with a lower id isn't skipped by the watermark.
+ROLLUP_GRACE = timedelta(minutes=1)
+BATCH_SIZE = 5000
+REFRESH_INTERVAL_SECONDS = 60
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def _watermark(db: Session, name: str) -> RollupWatermark:
+    mark = db.query(RollupWatermark).filter(RollupWatermark.name == name).with_for_update().first()
+    if mark is None:
+        try:
+            with db.begin_nested():
+                db.add(RollupWatermark(name=name, last_id=0))
+        except IntegrityError:
+            pass
+        mark = db.query(RollupWatermark).filter(RollupWatermark.name == name).with_for_update().first()
+    return mark
+
+
+def _stream(db: Session, stmt):
+    """Iterate a SELECT in BATCH_SIZE chunks through a server-side cursor, closing it early if abandoned."""
+    result = db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def _new_rows(db: Session, stmt, id_column, created_column, last_id: int, cutoff: datetime):
+    """Yield rows with id > last_id in id order, stopping at the first one newer than cutoff."""
+    for row in _stream(db, stmt.where(id_column > last_id).order_by(id_column)):
+        created_at = getattr(row, created_column.key)
+        if created_at is None or created_at >= cutoff:
+            break
+        yield row
+
+
+def refresh_rollups(db: Session) -> dict:
+    """
+    Fold orders and users created since the last run into the daily rollup
+    tables. Only rows past the watermarks are read, so the cost depends on
+    how much is new, not on the size of the order history.
+    """
+    cutoff = datetime.utcnow() - ROLLUP_GRACE
+    try:
+        orders_mark = _watermark(db, "orders")
+        users_mark = _watermark(db, "users")
+
+        daily = defaultdict(lambda: [0, 0.0, 0])  # day -> [orders, revenue, new_users]
+        order_days = {}
+        for o in _new_rows(
+            db, select(Order.id, Order.created_at, Order.total), Order.id, Order.created_at,
+            orders_mark.last_id, cutoff,
+        ):
+            day = o.created_at.date()
+            daily[day][0] += 1
+            daily[day][1] += o.total or 0.0
+            order_days[o.id] = day
+
+        categories = defaultdict(lambda: [0, 0.0])  # (day, category_id) -> [quantity, revenue]
+        if order_days:
+            last_order_id = max(order_days)
+            items = (
+                select(OrderItem.order_id, OrderItem.quantity, OrderItem.line_total, Product.category_id)
+                .join(Product, Product.id == OrderItem.product_id)
+                .where(OrderItem.order_id > orders_mark.last_id, OrderItem.order_id <= last_order_id)
+            )
+            for item in _stream(db, items):
+                day = order_days.get(item.order_id)
+                if day is None:
+                    continue
+                bucket = categories[(day, item.category_id)]
+                bucket[0] += item.quantity
+                bucket[1] += item.line_total or 0.0
+            orders_mark.last_id = last_order_id
+
+        new_users = 0
+        for u in _new_rows(db, select(User.id, User.created_at), User.id, User.created_at, users_mark.last_id, cutoff):
+            daily[u.created_at.date()][2] += 1
+            users_mark.last_id = u.id
+            new_users += 1
+
+        if daily:
+            existing = {
+                row.day: row
+                for row in db.query(DailyOrderStats).filter(DailyOrderStats.day.in_(list(daily)))
+            }
+            for day, (orders, revenue, users) in daily.items():
+                row = existing.get(day)
+                if row is None:
+                    row = DailyOrderStats(day=day, orders=0, revenue=0.0, new_users=0)
+                    db.add(row)
+                row.orders += orders
+                row.revenue = round(row.revenue + revenue, 2)
+                row.new_users += users
+
+        if categories:
+            days = {day for day, _ in categories}
+            existing = {
+                (row.day, row.category_id): row
+                for row in db.query(DailyCategorySales).filter(DailyCategorySales.day.in_(list(days)))
+            }
+            for (day, category_id), (quantity, revenue) in categories.items():
+                row = existing.get((day, category_id))
+                if row is None:
+                    row = DailyCategorySales(day=day, category_id=category_id, quantity=0, revenue=0.0)
+                    db.add(row)
+                row.quantity += quantity
+                row.revenue = round(row.revenue + revenue, 2)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"orders": len(order_days), "users": new_users}
+
+
+@job_handler("analytics_refresh")
+def run_refresh_job(db: Session, payload: dict, progress):
+    return refresh_rollups(db)
+
+
+def maybe_refresh_rollups(db: Session):
+    """Refresh at most once per REFRESH_INTERVAL_SECONDS per worker; used by the dashboard reads."""
+    global _last_refresh
+    if time.monotonic() - _last_refresh < REFRESH_INTERVAL_SECONDS:
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        refresh_rollups(db)
+        _last_refresh = time.monotonic()
+    finally:
+        _refresh_lock.release()
+
+
+def time_buckets(start: datetime, end: datetime, step: timedelta):
+    """Half-open [lo, hi) ranges of length `step` covering start..end."""
+    buckets = []
+    lo = start
+    while lo < end:
+        hi = min(lo + step, end)
+        buckets.append((lo, hi))
+        lo = hi
+    return buckets
+
+
+def count_orders_by_bucket(db: Session, buckets):
+    """
+    Orders and revenue per [lo, hi) bucket in one query.
+
+    Bucketing compares created_at against precomputed bounds instead of
+    applying a date function to the column, so it is portable across
+    dialects and the WHERE clause is a plain range on the created_at index.
+    """
+    if not buckets:
+        return []
+    columns = []
+    for lo, hi in buckets:
+        in_bucket = and_(Order.created_at >= lo, Order.created_at < hi)
+        columns.append(func.count(case((in_bucket, Order.id))))
+        columns.append(func.sum(case((in_bucket, Order.total), else_=0.0)))
+    row = (
+        db.query(*columns)
+        .filter(Order.created_at >= buckets[0][0], Order.created_at < buckets[-1][1])
+        .one()
+    )
+    return [
+        {"start": lo.isoformat(), "orders": row[2 * i] or 0, "revenue": round(row[2 * i + 1] or 0.0, 2)}
+        for i, (lo, _) in enumerate(buckets)
+    ]
+
+
+def get_daily_stats(db: Session, start: date, end: date):
+    """Daily rows for start <= day <= end, with missing days filled with zeros."""
+    rows = {
+        r.day: r
+        for r in db.query(DailyOrderStats).filter(DailyOrderStats.day >= start, DailyOrderStats.day <= end)
+    }
+    result = []
+    day = start
+    while day <= end:
+        r = rows.get(day)
+        result.append({
+            "day": day.isoformat(),
+            "orders": r.orders if r else 0,
+            "revenue": r.revenue if r else 0.0,
+            "new_users": r.new_users if r else 0,
+        })
+        day += timedelta(days=1)
+    return result
+
+
+def get_monthly_stats(db: Session, start: date = None, end: date = None):
+    """Monthly totals summed from the daily rollup (at most ~31 rows per month)."""
+    query = db.query(DailyOrderStats)
+    if start:
+        query = query.filter(DailyOrderStats.day >= start)
+    if end:
+        query = query.filter(DailyOrderStats.day <= end)
+
+    months = {}
+    for r in query.order_by(DailyOrderStats.day):
+        month = r.day.strftime("%Y-%m")
+        m = months.setdefault(month, {"month": month, "orders": 0, "revenue": 0.0, "new_users": 0})
+        m["orders"] += r.orders
+        m["revenue"] = round(m["revenue"] + r.revenue, 2)
+        m["new_users"] += r.new_users
+    return list(months.values())
+
+
+def get_category_sales(db: Session, start: date, end: date):
+    rows = (
+        db.query(
+            DailyCategorySales.category_id,
+            func.sum(DailyCategorySales.quantity).label("quantity"),
+            func.sum(DailyCategorySales.revenue).label("revenue"),
+        )
+        .filter(DailyCategorySales.day >= start, DailyCategorySales.day <= end)
+        .group_by(DailyCategorySales.category_id)
+        .order_by(func.sum(DailyCategorySales.revenue).desc())
+        .all()
+    )
+    return [
+        {"category_id": r.category_id, "quantity": int(r.quantity or 0), "revenue": round(r.revenue or 0.0, 2)}
+        for r in rows
+    ]
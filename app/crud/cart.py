@@ -3,6 +3,7 @@
 from sqlalchemy.orm import Session
 from app.models import CartItem
 from app.schemas.cart import CartItemCreate, CartItemUpdate
+from app.crud.membership import invalidate_membership
 
 def get_cart_items(db: Session, user_id: int):
     return db.query(CartItem).filter(CartItem.user_id == user_id).all()
@@ -20,6 +21,7 @@ def add_to_cart(db: Session, user_id: int, item: CartItemCreate):
         db.add(db_item)
 
     db.commit()
+    invalidate_membership(user_id)
     db.refresh(db_item)
     return db_item
 
@@ -36,7 +38,9 @@ def delete_cart_item(db: Session, item_id: int):
     if item:
         db.delete(item)
         db.commit()
+        invalidate_membership(item.user_id)
 
 def clear_cart(db: Session, user_id: int):
     db.query(CartItem).filter(CartItem.user_id == user_id).delete()
     db.commit()
+    invalidate_membership(user_id)
@@ -2,6 +2,9 @@ from sqlalchemy.orm import Session, joinedload
 from app import models
 from app.schemas import category as category_schema
 
+# cache_versions name for the category tree; bumped by every category/subcategory write
+CATEGORY_CACHE = "categories"
+
 # --- CATEGORY CRUD FUNCTIONS ---
 
 def get_category_by_name(db: Session, name: str):
@@ -1,7 +1,17 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import func, or_, true
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app import models, schemas
+from app.cache import bump_version, get_version
+from app.pagination import keyset_page
 from app.schemas import coupon as coupon_schema
 
+COUPON_CACHE = "coupons"
+
 def get_coupon_by_code(db: Session, code: str):
     return db.query(models.Coupon).filter(models.Coupon.code == code).first()
 
@@ -18,15 +28,37 @@ def create_coupon(db: Session, coupon: coupon_schema.CouponCreate):
         valid_from=coupon.valid_from,
         valid_to=coupon.valid_to,
         max_uses=coupon.max_uses,
+        max_uses_per_user=coupon.max_uses_per_user,
         active=coupon.active
     )
     db.add(db_coupon)
+    bump_version(db, COUPON_CACHE)
     db.commit()
     db.refresh(db_coupon)
     return db_coupon
 
-def get_coupon(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Coupon).offset(skip).limit(limit).all()
+def _filtered_coupons(db: Session, active: bool = None, redeemable: bool = False):
+    query = db.query(models.Coupon)
+    if active is not None:
+        query = query.filter(models.Coupon.active == active)
+    if redeemable:
+        # active, inside the validity window and with uses left
+        now = datetime.utcnow()
+        query = query.filter(
+            models.Coupon.active == true(),
+            models.Coupon.valid_to >= now,
+            models.Coupon.valid_from <= now,
+            or_(models.Coupon.max_uses.is_(None), func.coalesce(models.Coupon.used_count, 0) < models.Coupon.max_uses),
+        )
+    return query
+
+def get_coupon(db: Session, after_id: int = None, limit: int = 100, active: bool = None, redeemable: bool = False):
+    """Keyset page of coupons ordered by id; returns (coupons, next_cursor)."""
+    query = _filtered_coupons(db, active=active, redeemable=redeemable)
+    return keyset_page(query, models.Coupon.id, after_id, limit)
+
+def count_coupons(db: Session, active: bool = None, redeemable: bool = False) -> int:
+    return _filtered_coupons(db, active=active, redeemable=redeemable).order_by(None).count()
 
 def update_coupon(db: Session, db_coupon: models.Coupon, coupon_update: coupon_schema.CouponUpdate):
     # Update the coupon details based on the fields provided in coupon_update
@@ -34,6 +66,7 @@ def update_coupon(db: Session, db_coupon: models.Coupon, coupon_update: coupon_s
         setattr(db_coupon, key, value)
 
     # Commit the changes to the database
+    bump_version(db, COUPON_CACHE)
     db.commit()
     db.refresh(db_coupon)
 
@@ -41,4 +74,168 @@ def update_coupon(db: Session, db_coupon: models.Coupon, coupon_update: coupon_s
 
 def delete_coupon(db: Session, db_coupon: models.Coupon):
     db.delete(db_coupon)
+    bump_version(db, COUPON_CACHE)
     db.commit()
+
+# --- IN-MEMORY COUPON INDEX ---
+
+CouponSnapshot = namedtuple("CouponSnapshot", [
+    "id", "code", "description", "discount_type", "discount_value", "minimum_purchase",
+    "valid_from", "valid_to", "max_uses", "max_uses_per_user", "used_count", "active",
+])
+
+def normalize_code(code: str) -> str:
+    # same semantics as the case-insensitive collation on coupons.code
+    return (code or "").strip().upper()
+
+class CouponIndex:
+    """
+    Map of normalized code -> CouponSnapshot for active, unexpired coupons.
+
+    Lookups are a dict access. Writes bump the "coupons" cache version; each
+    worker compares its loaded version with the database at most every
+    `check_interval` seconds and reloads when another node changed something.
+    `used_count` in a snapshot is informational only -- redemption always
+    goes through the conditional UPDATE in `redeem_coupon`.
+    """
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._by_code = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        with self._lock:
+            version = get_version(db, COUPON_CACHE)
+            rows = (
+                db.query(models.Coupon)
+                .filter(models.Coupon.active == true(), models.Coupon.valid_to >= datetime.utcnow())
+                .all()
+            )
+            self._by_code = {
+                normalize_code(c.code): CouponSnapshot(*(getattr(c, f) for f in CouponSnapshot._fields))
+                for c in rows
+            }
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def _check_version(self, db: Session):
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if self._version is None or get_version(db, COUPON_CACHE) != self._version:
+            self.load(db)
+        else:
+            self._checked_at = time.monotonic()
+
+    def get(self, db: Session, code: str):
+        self._check_version(db)
+        return self._by_code.get(normalize_code(code))
+
+    def version(self, db: Session) -> int:
+        """Current coupon data version, for keying caches derived from coupons."""
+        self._check_version(db)
+        return self._version
+
+coupon_index = CouponIndex()
+
+def _user_redemptions(db: Session, coupon_id: int, user_id: int) -> int:
+    return (
+        db.query(func.count(models.CouponRedemption.id))
+        .filter(models.CouponRedemption.coupon_id == coupon_id, models.CouponRedemption.user_id == user_id)
+        .scalar()
+    )
+
+def get_valid_coupon(db: Session, code: str, subtotal: float, user_id: int = None):
+    """Return the coupon for `code` if it can be applied to `subtotal`, else raise ValueError.
+
+    This is a read-only pre-check for showing the discount; the usage limits
+    are only authoritative in `redeem_coupon`.
+    """
+    coupon = coupon_index.get(db, code)
+    if not coupon or not coupon.active:
+        raise ValueError("Invalid coupon code")
+
+    now = datetime.utcnow()
+    if coupon.valid_from and coupon.valid_from > now:
+        raise ValueError("Coupon is not active yet")
+    if coupon.valid_to and coupon.valid_to < now:
+        raise ValueError("Coupon has expired")
+    if subtotal < (coupon.minimum_purchase or 0.0):
+        raise ValueError(f"Minimum purchase of {coupon.minimum_purchase} required for this coupon")
+    if coupon.max_uses is not None and (coupon.used_count or 0) >= coupon.max_uses:
+        raise ValueError("Coupon usage limit reached")
+    if (
+        user_id is not None
+        and coupon.max_uses_per_user is not None
+        and _user_redemptions(db, coupon.id, user_id) >= coupon.max_uses_per_user
+    ):
+        raise ValueError("You have already used this coupon")
+    return coupon
+
+def _locked_use_numbers(db: Session, coupon_id: int, user_id: int) -> list:
+    """
+    The user's redemption slots, read with FOR UPDATE. A locking read sees
+    the latest committed rows rather than the transaction's REPEATABLE READ
+    snapshot, and holds the range until commit so the same user's next
+    redemption waits instead of racing for the slot.
+    """
+    return [
+        n for (n,) in db.query(models.CouponRedemption.use_number)
+        .filter(models.CouponRedemption.coupon_id == coupon_id, models.CouponRedemption.user_id == user_id)
+        .with_for_update()
+    ]
+
+def redeem_coupon(db: Session, coupon, user_id: int, order_id: int = None, discount: float = 0.0):
+    """
+    Consume one use of `coupon` inside the caller's transaction (no commit).
+
+    The global counter is bumped with a single conditional UPDATE, so the
+    database decides whether a use is left and concurrent redemptions can't
+    oversell or lose increments. The per-user limit is checked against a
+    locking read of the user's slots and enforced by the unique
+    (coupon_id, user_id, use_number) slot in coupon_redemptions; if a
+    concurrent redemption still takes the slot first, this one fails.
+    Raises ValueError when the coupon can no longer be redeemed.
+    """
+    now = datetime.utcnow()
+    Coupon = models.Coupon
+    used = func.coalesce(Coupon.used_count, 0)
+    result = db.execute(
+        Coupon.__table__.update()
+        .where(
+            Coupon.id == coupon.id,
+            Coupon.active == true(),
+            Coupon.valid_from <= now,
+            Coupon.valid_to >= now,
+            or_(Coupon.max_uses.is_(None), used < Coupon.max_uses),
+        )
+        .values(used_count=used + 1)
+    )
+    if result.rowcount != 1:
+        raise ValueError("Coupon usage limit reached")
+
+    use_numbers = _locked_use_numbers(db, coupon.id, user_id)
+    if coupon.max_uses_per_user is not None and len(use_numbers) >= coupon.max_uses_per_user:
+        raise ValueError("You have already used this coupon")
+    try:
+        # savepoint, so a lost race leaves the caller's transaction usable
+        with db.begin_nested():
+            db.add(models.CouponRedemption(
+                coupon_id=coupon.id,
+                user_id=user_id,
+                order_id=order_id,
+                use_number=max(use_numbers, default=0) + 1,
+                discount=discount,
+            ))
+    except IntegrityError:
+        raise ValueError("Coupon is being redeemed concurrently, please retry")
+
+def calculate_discount(coupon: models.Coupon, subtotal: float) -> float:
+    if coupon.discount_type == "percentage":
+        discount = subtotal * coupon.discount_value / 100
+    else:
+        discount = coupon.discount_value
+    # never discount more than the order is worth
+    return round(min(max(discount, 0.0), subtotal), 2)
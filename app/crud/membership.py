@@ -0,0 +1,32 @@
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.models.cart import CartItem, WishlistItem
+
+# user_id -> (wishlist product ids, cart product ids). Entries are evicted by
+# the wishlist/cart mutations in this process; the TTL bounds how stale
+# another worker process's copy can get.
+membership_cache = TTLCache(ttl=60, maxsize=10000)
+
+
+def get_membership(db: Session, user_id: int):
+    """Sets of product ids in the user's wishlist and cart, from one UNION ALL query."""
+    cached = membership_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    rows = db.execute(union_all(
+        select(literal("w").label("source"), WishlistItem.product_id).where(WishlistItem.user_id == user_id),
+        select(literal("c").label("source"), CartItem.product_id).where(CartItem.user_id == user_id),
+    )).all()
+    membership = (
+        frozenset(product_id for source, product_id in rows if source == "w"),
+        frozenset(product_id for source, product_id in rows if source == "c"),
+    )
+    membership_cache.set(user_id, membership)
+    return membership
+
+
+def invalidate_membership(user_id: int):
+    membership_cache.pop(user_id)
@@ -1,14 +1,175 @@
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.models import order as models
+from app.models.cart import CartItem
+from app.models.product import Product
 from app.schemas import order as schemas
+from app.crud import address as address_crud
+from app.crud import coupon as coupon_crud
+from app.cache import bump_versions
+from app.crud.membership import invalidate_membership
+from app.crud.product import product_cache
+from app import events
+from app.pagination import keyset_page_desc
+
+
+class CheckoutError(ValueError):
+    """The cart can't be checked out as requested (HTTP 400)."""
+
+class CheckoutNotFound(CheckoutError):
+    """Something the checkout refers to doesn't exist (HTTP 404)."""
+
+class CheckoutConflict(CheckoutError):
+    """Stock or coupon state changed under the checkout (HTTP 409)."""
+
+    def __init__(self, message: str, product_ids=None):
+        super().__init__(message)
+        self.product_ids = product_ids
+
+
+def _unit_price(price: float, discount_price: float) -> float:
+    # discount_price of 0/None means "no sale price"
+    if discount_price and 0 < discount_price < price:
+        return discount_price
+    return price
+
+
+def create_order(db: Session, user_id: int, order: schemas.OrderCreate):
+    """
+    Checkout: turn the user's cart into an order.
+
+    Everything happens in one transaction: line items are snapshotted from
+    current product prices, stock is reserved with a single conditional
+    UPDATE (no read-modify-write, so concurrent checkouts can't oversell),
+    the coupon is redeemed, items are inserted in one batch and the cart is
+    cleared.
+    """
+    try:
+        rows = (
+            db.query(
+                CartItem.product_id,
+                CartItem.quantity,
+                Product.name,
+                Product.price,
+                Product.discount_price,
+                Product.in_stock,
+            )
+            .join(Product, Product.id == CartItem.product_id)
+            .filter(CartItem.user_id == user_id)
+            .order_by(CartItem.product_id)
+            .all()
+        )
+        if not rows:
+            raise CheckoutError("Cart is empty")
+
+        # merge duplicate cart rows for the same product
+        lines = {}
+        for r in rows:
+            if not r.in_stock:
+                raise CheckoutConflict(f"Product {r.product_id} is out of stock")
+            if r.quantity is None or r.quantity < 1:
+                continue
+            if r.product_id in lines:
+                lines[r.product_id]["quantity"] += r.quantity
+            else:
+                lines[r.product_id] = {
+                    "product_id": r.product_id,
+                    "product_name": r.name,
+                    "unit_price": _unit_price(r.price, r.discount_price),
+                    "quantity": r.quantity,
+                }
+        if not lines:
+            raise CheckoutError("Cart is empty")
+
+        subtotal = 0.0
+        for line in lines.values():
+            line["line_total"] = round(line["unit_price"] * line["quantity"], 2)
+            subtotal += line["line_total"]
+        subtotal = round(subtotal, 2)
+
+        if order is not None and order.address_id is not None:
+            address = address_crud.get_address(db, user_id, order.address_id)
+            if address is None:
+                raise CheckoutNotFound("Address not found")
+        else:
+            address = address_crud.get_default_address(db, user_id)
+
+        coupon = None
+        discount = 0.0
+        if order is not None and order.coupon_code:
+            try:
+                coupon = coupon_crud.get_valid_coupon(db, order.coupon_code, subtotal, user_id=user_id)
+            except ValueError as e:
+                raise CheckoutError(str(e))
+            discount = coupon_crud.calculate_discount(coupon, subtotal)
+
+        # Reserve stock for every line in one statement. Untracked stock (NULL)
+        # stays NULL; tracked stock only matches when enough is left.
+        qty = case({pid: line["quantity"] for pid, line in lines.items()}, value=Product.id)
+        result = db.execute(
+            update(Product)
+            .where(Product.id.in_(list(lines)))
+            .where(or_(Product.stock.is_(None), Product.stock >= qty))
+            .values(stock=Product.stock - qty)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(lines):
+            db.rollback()
+            short = [
+                p.id for p in db.query(Product.id, Product.stock).filter(Product.id.in_(list(lines)))
+                if p.stock is not None and p.stock < lines[p.id]["quantity"]
+            ]
+            raise CheckoutConflict("Insufficient stock", short)
+
+        db_order = models.Order(
+            user_id=user_id,
+            subtotal=subtotal,
+            discount=discount,
+            total=round(max(subtotal - discount, 0.0), 2),
+            coupon_code=coupon.code if coupon else None,
+            address_id=address.id if address else None,
+            shipping_address=address_crud.snapshot(address) if address else None,
+        )
+        db.add(db_order)
+        db.flush()  # to get db_order.id
+
+        if coupon:
+            try:
+                coupon_crud.redeem_coupon(db, coupon, user_id, order_id=db_order.id, discount=discount)
+            except ValueError as e:
+                raise CheckoutConflict(str(e))
+
+        db.execute(
+            insert(models.OrderItem),
+            [dict(line, order_id=db_order.id) for line in lines.values()],
+        )
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete(synchronize_session=False)
+        bump_versions(db, [product_cache(pid) for pid in lines])  # cached product pages show stock
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidate_membership(user_id)
 
-def create_order(db: Session, order: schemas.OrderCreate):
-    db_order = models.Order(user_id=order.user_id)
-    db.add(db_order)
-    db.commit()
     db.refresh(db_order)
     return db_order
 
+def order_topic(order_id: int) -> str:
+    return f"order:{order_id}"
+
+def tracking_event(update) -> dict:
+    """JSON-ready message pushed to tracking subscribers."""
+    return {
+        "id": update.id,
+        "status": update.status,
+        "message": update.message,
+        "timestamp": update.timestamp.isoformat() if update.timestamp else None,
+    }
+
 def add_tracking_update(db: Session, order_id: int, status: str, message: str):
     update = models.OrderTracking(order_id=order_id, status=status, message=message)
     db.add(update)
@@ -19,7 +180,195 @@ def add_tracking_update(db: Session, order_id: int, status: str, message: str):
         order.status = status
 
     db.commit()
+    # only after commit, so subscribers never see an update that was rolled back
+    events.publish(order_topic(order_id), tracking_event(update))
     return update
 
+TRACKING_CHUNK_SIZE = 1000
+
+def _utc_naive(value):
+    # timestamps are stored as naive UTC, like datetime.utcnow() defaults
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _ingest_chunk(db: Session, chunk, now: datetime):
+    Tracking = models.OrderTracking
+    order_ids = {e.order_id for e in chunk}
+    known = {id_ for (id_,) in db.query(models.Order.id).filter(models.Order.id.in_(order_ids))}
+    existing = {
+        event_id for (event_id,) in db.query(Tracking.event_id)
+        .filter(Tracking.event_id.in_([e.event_id for e in chunk]))
+    }
+    rows = [
+        {
+            "event_id": e.event_id,
+            "order_id": e.order_id,
+            "status": e.status,
+            "message": e.message,
+            "timestamp": _utc_naive(e.timestamp) or now,
+        }
+        for e in chunk
+        if e.order_id in known and e.event_id not in existing
+    ]
+    if not rows:
+        return [], order_ids - known
+
+    # newest event per order; the order status only moves forward in time,
+    # so a late-delivered old scan doesn't overwrite a newer status
+    latest = {}
+    for row in rows:
+        current = latest.get(row["order_id"])
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            latest[row["order_id"]] = row
+    last_seen = dict(
+        db.query(Tracking.order_id, func.max(Tracking.timestamp))
+        .filter(Tracking.order_id.in_(list(latest)))
+        .group_by(Tracking.order_id)
+    )
+    new_status = {
+        order_id: row["status"]
+        for order_id, row in latest.items()
+        if last_seen.get(order_id) is None or row["timestamp"] >= last_seen[order_id]
+    }
+
+    db.execute(insert(Tracking), rows)
+    if new_status:
+        db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(list(new_status)))
+            .values(status=case(new_status, value=models.Order.id))
+            .execution_options(synchronize_session=False)
+        )
+    inserted = (
+        db.query(Tracking)
+        .filter(Tracking.event_id.in_([r["event_id"] for r in rows]))
+        .order_by(Tracking.timestamp, Tracking.id)
+        .all()
+    )
+    return inserted, order_ids - known
+
+def ingest_tracking_events(db: Session, tracking_events):
+    """
+    Bulk-insert carrier scan events.
+
+    Events are de-duplicated by event_id within the request and against
+    what is already stored, events for unknown orders are skipped, and each
+    chunk of TRACKING_CHUNK_SIZE events is one multi-row INSERT plus one
+    UPDATE ... CASE for the affected orders' status, committed together.
+    """
+    unique = list({e.event_id: e for e in tracking_events}.values())
+    now = datetime.utcnow()
+    inserted = []
+    unknown = set()
+    for start in range(0, len(unique), TRACKING_CHUNK_SIZE):
+        chunk = unique[start:start + TRACKING_CHUNK_SIZE]
+        for attempt in range(2):
+            try:
+                rows, missing = _ingest_chunk(db, chunk, now)
+                db.commit()
+                break
+            except IntegrityError:
+                # a concurrent delivery stored some of these event ids first; retry without them
+                db.rollback()
+                if attempt:
+                    raise
+        inserted.extend(rows)
+        unknown |= missing
+
+    for row in inserted:
+        events.publish(order_topic(row.order_id), tracking_event(row))
+    return {
+        "received": len(tracking_events),
+        "inserted": len(inserted),
+        "duplicates": len(tracking_events) - len(inserted) - sum(1 for e in unique if e.order_id in unknown),
+        "unknown_orders": sorted(unknown),
+    }
+
+def get_order_history(db: Session, user_id: int, cursor: str = None, limit: int = 20,
+                      with_items: bool = False, with_tracking: bool = False):
+    """
+    One newest-first page of a user's orders, over the (user_id, created_at)
+    index. Line items and the latest tracking update are loaded for the
+    whole page with one query each, never per order.
+    Returns (orders as dicts, next_cursor); raises ValueError for a bad cursor.
+    """
+    Order = models.Order
+    query = db.query(
+        Order.id, Order.status, Order.created_at, Order.subtotal,
+        Order.discount, Order.total, Order.coupon_code,
+    ).filter(Order.user_id == user_id)
+    rows, next_cursor = keyset_page_desc(query, Order.created_at, Order.id, cursor, limit)
+    orders = [dict(row._mapping) for row in rows]
+    ids = [o["id"] for o in orders]
+
+    if with_items and ids:
+        items = {}
+        for item in db.query(models.OrderItem).filter(models.OrderItem.order_id.in_(ids)).order_by(models.OrderItem.id):
+            items.setdefault(item.order_id, []).append(item)
+        for o in orders:
+            o["items"] = items.get(o["id"], [])
+
+    if with_tracking and ids:
+        Tracking = models.OrderTracking
+        newest = (
+            db.query(Tracking.order_id, func.max(Tracking.timestamp).label("timestamp"))
+            .filter(Tracking.order_id.in_(ids))
+            .group_by(Tracking.order_id)
+            .subquery()
+        )
+        latest = {}
+        for t in (
+            db.query(Tracking)
+            .join(newest, and_(Tracking.order_id == newest.c.order_id, Tracking.timestamp == newest.c.timestamp))
+            .order_by(Tracking.id)
+        ):
+            latest[t.order_id] = t  # highest id wins a timestamp tie
+        for o in orders:
+            t = latest.get(o["id"])
+            o["latest_tracking"] = tracking_event(t) if t else None
+
+    return orders, next_cursor
+
 def get_order_with_tracking(db: Session, order_id: int):
     return db.query(models.Order).filter(models.Order.id == order_id).first()
+
+def can_view_order(db: Session, order_id: int, user) -> bool:
+    """True if the order exists and `user` owns it or is an admin."""
+    owner = db.query(models.Order.user_id).filter(models.Order.id == order_id).first()
+    return owner is not None and (user.role == "admin" or owner[0] == user.id)
+
+def get_order_timeline(db: Session, order_id: int):
+    """
+    The order's status plus its tracking updates, oldest first, read with one
+    outer-joined query over the (order_id, timestamp) index. None if the
+    order doesn't exist.
+    """
+    Tracking = models.OrderTracking
+    rows = (
+        db.query(
+            models.Order.status, models.Order.created_at,
+            Tracking.id, Tracking.status, Tracking.message, Tracking.timestamp,
+        )
+        .outerjoin(Tracking, Tracking.order_id == models.Order.id)
+        .filter(models.Order.id == order_id)
+        .order_by(Tracking.timestamp, Tracking.id)
+        .all()
+    )
+    if not rows:
+        return None
+    return {
+        "order_id": order_id,
+        "status": rows[0][0],
+        "created_at": rows[0][1],
+        "tracking": [
+            {"id": r[2], "status": r[3], "message": r[4], "timestamp": r[5]}
+            for r in rows if r[2] is not None
+        ],
+    }
+
+def timeline_etag(timeline: dict) -> str:
+    """Changes whenever a tracking update is added or the order status changes."""
+    last_id = max((t["id"] for t in timeline["tracking"]), default=0)
+    digest = hashlib.sha1(f"{timeline['order_id']}:{last_id}:{timeline['status']}".encode()).hexdigest()[:16]
+    return f'"{digest}"'
@@ -1,7 +1,9 @@
 import json
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
+from app.cache import bump_version
 from app.models.product import Product
-from app.schemas.product import ProductOut
+from app.schemas.product import ProductBulkUpdate, ProductOut
 
 
 # Create product
@@ -47,3 +49,80 @@ def get_products(db: Session, skip: int = 0, limit: int = 100):
         product.sizes = json.loads(product.sizes) if product.sizes else []
 
     return products
+
+
+PRODUCT_CACHE = "products"
+# one product's own version; checkout bumps it so a sale doesn't invalidate every product page
+PRODUCT_ITEM_CACHE = PRODUCT_CACHE + ":{product_id}"
+
+
+def product_cache(product_id: int) -> str:
+    return PRODUCT_ITEM_CACHE.format(product_id=product_id)
+
+BULK_UPDATE_FIELDS = ("price", "discount_price", "in_stock", "featured", "best_seller", "new_arrival")
+
+
+def bulk_update_products(db: Session, changes: ProductBulkUpdate):
+    """
+    Apply the same partial update to every product matched by `changes`
+    (ids and/or category/subcategory) with one UPDATE statement.
+
+    A discount_price is only written where it ends up below the price:
+    products for which it wouldn't (a sale price above their current
+    price, or a new price under their current sale price) are skipped.
+
+    Returns (updated ids, skipped ids) so callers can invalidate
+    per-product caches; the products cache version is bumped once.
+    """
+    filters = []
+    if changes.ids is not None:
+        filters.append(Product.id.in_(changes.ids))
+    if changes.category_id is not None:
+        filters.append(Product.category_id == changes.category_id)
+    if changes.subcategory_id is not None:
+        filters.append(Product.subcategory_id == changes.subcategory_id)
+    if not filters:
+        raise ValueError("Select products by ids, category_id or subcategory_id")
+
+    values = {
+        getattr(Product, field): getattr(changes, field)
+        for field in BULK_UPDATE_FIELDS
+        if getattr(changes, field) is not None
+    }
+    if changes.discount_percent is not None:
+        if changes.discount_price is not None:
+            raise ValueError("Give either discount_price or discount_percent, not both")
+        factor = 1 - changes.discount_percent / 100
+        if changes.price is not None:
+            values[Product.discount_price] = round(changes.price * factor, 2)
+        else:
+            # computed per row from its current price, still in the same UPDATE
+            values[Product.discount_price] = func.round(Product.price * factor, 2)
+    if not values:
+        raise ValueError("Nothing to update")
+
+    # the schema checks discount_price against a price given with it; against
+    # each row's own price it can only be checked in the statement
+    guard = None
+    if changes.discount_price is not None and changes.price is None:
+        guard = Product.price > changes.discount_price
+    elif changes.price is not None and Product.discount_price not in values:
+        guard = or_(Product.discount_price.is_(None), Product.discount_price < changes.price)
+
+    try:
+        if guard is None:
+            ids = [id_ for (id_,) in db.query(Product.id).filter(*filters).with_for_update()]
+            skipped = []
+        else:
+            rows = db.query(Product.id, guard).filter(*filters).with_for_update().all()
+            ids = [id_ for id_, allowed in rows if allowed]
+            skipped = [id_ for id_, allowed in rows if not allowed]
+            filters.append(guard)
+        if ids:
+            db.query(Product).filter(*filters).update(values, synchronize_session=False)
+            bump_version(db, PRODUCT_CACHE)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return ids, skipped
@@ -0,0 +1,258 @@
+"""
+Bulk product import from CSV or NDJSON.
+
+NDJSON rows follow schemas.product.ProductImportRow, e.g.
+    {"sku": "TS-001", "name": "Tee", "price": 499, "category": "men",
+     "subcategory": "men-tshirts", "sizes": ["S", "M"],
+     "colors": [{"name": "Red", "images": ["tee_red.jpg"]}]}
+
+CSV uses the same column names, with lists separated by "|":
+    sizes       S|M|L
+    colors      Red|Blue
+    images      Red=tee_red.jpg;tee_red_2.jpg|Blue=tee_blue.jpg
+
+Image values are stored as-is, i.e. file names under static/uploads/products.
+
+Usage: python -m app.crud.product_import catalog.csv [--batch-size 1000]
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.jobs import job_handler
+from app.models.category import Category, SubCategory
+from app.models.product import Product, ProductColor, ProductImage
+from app.schemas.product import ProductImportRow
+
+BATCH_SIZE = 1000
+# where uploads wait for a background import; must be shared with the worker process
+IMPORT_DIR = os.getenv("IMPORT_DIR", os.path.join(tempfile.gettempdir(), "jokroup-imports"))
+MAX_REPORTED_ERRORS = 1000
+
+LIST_SEPARATOR = "|"
+TRUE_VALUES = {"1", "true", "yes", "y"}
+BOOL_FIELDS = ("in_stock", "featured", "best_seller", "new_arrival")
+
+
+def _split(value: str):
+    return [v.strip() for v in (value or "").split(LIST_SEPARATOR) if v.strip()]
+
+
+def _csv_record(record: dict) -> dict:
+    """Turn a flat CSV record into the nested shape ProductImportRow expects."""
+    row = {k: v for k, v in record.items() if k and v not in (None, "")}
+    row["sizes"] = _split(record.get("sizes"))
+
+    images = {}
+    for part in _split(record.get("images")):
+        color, _, files = part.partition("=")
+        images[color.strip().lower()] = [f.strip() for f in files.split(";") if f.strip()]
+    row["colors"] = [
+        {"name": name, "images": images.get(name.lower(), [])} for name in _split(record.get("colors"))
+    ]
+    row.pop("images", None)
+
+    for field in BOOL_FIELDS:
+        if field in row:
+            row[field] = row[field].strip().lower() in TRUE_VALUES
+    return row
+
+
+def iter_records(stream, fmt: str):
+    """Yield (row_number, record) from a binary file object; row numbers are 1-based data rows."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, _csv_record(record)
+    else:
+        for number, line in enumerate(text, start=1):
+            line = line.strip()
+            if line:
+                yield number, line
+
+
+def _load_taxonomy(db: Session):
+    categories = {slug: id_ for id_, slug in db.query(Category.id, Category.slug)}
+    subcategories = {
+        slug: (id_, category_id) for id_, slug, category_id in db.query(SubCategory.id, SubCategory.slug, SubCategory.category_id)
+    }
+    return categories, subcategories
+
+
+def _insert_batch(db: Session, rows):
+    """Insert a batch of validated rows with one executemany per table."""
+    skus = [r.sku for r, _, _ in rows]
+    db.execute(insert(Product), [
+        {
+            "sku": r.sku,
+            "name": r.name,
+            "description": r.description,
+            "price": r.price,
+            "discount_price": r.discount_price,
+            "category_id": category_id,
+            "subcategory_id": subcategory_id,
+            "sizes": r.sizes,
+            "in_stock": r.in_stock,
+            "stock": r.stock,
+            "featured": r.featured,
+            "best_seller": r.best_seller,
+            "new_arrival": r.new_arrival,
+            "highlights": r.highlights,
+            "specifications": r.specifications,
+            "details": r.details,
+        }
+        for r, category_id, subcategory_id in rows
+    ])
+    # MySQL has no INSERT ... RETURNING, so read the new ids back by SKU
+    product_ids = dict(db.execute(select(Product.sku, Product.id).where(Product.sku.in_(skus))).all())
+
+    colors = [
+        {"product_id": product_ids[r.sku], "color_name": c.name}
+        for r, _, _ in rows for c in r.colors
+    ]
+    if not colors:
+        return
+    db.execute(insert(ProductColor), colors)
+    color_ids = {
+        (product_id, name): id_
+        for id_, product_id, name in db.execute(
+            select(ProductColor.id, ProductColor.product_id, ProductColor.color_name)
+            .where(ProductColor.product_id.in_(list(product_ids.values())))
+        )
+    }
+
+    images = [
+        {"color_id": color_ids[(product_ids[r.sku], c.name)], "image_url": url}
+        for r, _, _ in rows for c in r.colors for url in c.images
+    ]
+    if images:
+        db.execute(insert(ProductImage), images)
+
+
+def import_products(db: Session, records, batch_size: int = BATCH_SIZE, on_batch=None) -> dict:
+    """
+    Validate and insert products from (row_number, record) pairs.
+
+    Each batch is validated, checked for duplicate SKUs and inserted in its
+    own transaction, so a bad batch only rolls back itself. Returns a report
+    with per-row errors and throughput; `on_batch(report)` is called after
+    every batch.
+    """
+    started = time.perf_counter()
+    categories, subcategories = _load_taxonomy(db)
+    report = {"processed": 0, "inserted": 0, "failed": 0, "errors": []}
+
+    def fail(number, sku, error):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "sku": sku, "error": error})
+
+    def flush(batch):
+        valid = {}
+        for number, record in batch:
+            try:
+                if isinstance(record, str):
+                    row = ProductImportRow.model_validate_json(record)
+                else:
+                    row = ProductImportRow.model_validate(record)
+            except ValidationError as e:
+                sku = record.get("sku") if isinstance(record, dict) else None
+                fail(number, sku, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+
+            category_id = categories.get(row.category)
+            sub = subcategories.get(row.subcategory)
+            if category_id is None:
+                fail(number, row.sku, f"unknown category '{row.category}'")
+            elif sub is None or sub[1] != category_id:
+                fail(number, row.sku, f"unknown subcategory '{row.subcategory}' for category '{row.category}'")
+            elif row.sku in valid:
+                fail(number, row.sku, "duplicate sku in file")
+            else:
+                valid[row.sku] = (number, row, category_id, sub[0])
+
+        if valid:
+            existing = {
+                sku for (sku,) in db.execute(select(Product.sku).where(Product.sku.in_(list(valid))))
+            }
+            for sku in existing:
+                fail(valid.pop(sku)[0], sku, "sku already exists")
+
+        if valid:
+            try:
+                _insert_batch(db, [(row, category_id, sub_id) for _, row, category_id, sub_id in valid.values()])
+                db.commit()
+                report["inserted"] += len(valid)
+            except Exception as e:
+                db.rollback()
+                for number, row, _, _ in valid.values():
+                    fail(number, row.sku, f"batch insert failed: {e.__class__.__name__}")
+        if on_batch is not None:
+            on_batch(report)
+
+    batch = []
+    for number, record in records:
+        report["processed"] += 1
+        batch.append((number, record))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["processed"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+def _remove_upload(payload: dict):
+    """The upload is kept between retries; drop it once the job has failed for good."""
+    path = payload.get("path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+@job_handler("product_import", on_failure=_remove_upload)
+def run_import_job(db: Session, payload: dict, progress):
+    """Background import of an uploaded file; payload: path, format, batch_size."""
+    path = payload["path"]
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as f:
+        report = import_products(
+            db,
+            iter_records(f, payload.get("format", "ndjson")),
+            batch_size=payload.get("batch_size", BATCH_SIZE),
+            on_batch=lambda r: progress(f.tell() / size, f"{r['processed']} rows processed"),
+        )
+    os.remove(path)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if os.path.splitext(args.path)[1].lower() == ".csv" else "ndjson")
+    init_db()
+    session = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            result = import_products(session, iter_records(f, fmt), batch_size=args.batch_size)
+    finally:
+        session.close()
+    print(json.dumps(result, indent=2))
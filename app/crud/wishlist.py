@@ -1,13 +1,88 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app import models, schemas
+from app.models.product import ProductColor, ProductImage
+from app.crud.membership import invalidate_membership
 
 def get_user_wishlist(db: Session, user_id: int):
     return db.query(models.WishlistItem).filter(models.WishlistItem.user_id == user_id).all()
 
+def get_user_wishlist_products(db: Session, user_id: int):
+    """
+    Wishlist entries with product name, prices, stock and a thumbnail file
+    name. One query per level (items, products, first colors, first images),
+    each an IN over the previous level's ids, however long the list is.
+    """
+    items = (
+        db.query(models.WishlistItem.id, models.WishlistItem.product_id)
+        .filter(models.WishlistItem.user_id == user_id)
+        .order_by(models.WishlistItem.id.desc())
+        .all()
+    )
+    product_ids = list({i.product_id for i in items})
+    if not product_ids:
+        return []
+
+    Product = models.Product
+    products = {
+        p.id: p for p in db.query(
+            Product.id, Product.name, Product.price, Product.discount_price, Product.in_stock,
+        ).filter(Product.id.in_(product_ids))
+    }
+    first_colors = dict(
+        db.query(ProductColor.product_id, func.min(ProductColor.id))
+        .filter(ProductColor.product_id.in_(product_ids))
+        .group_by(ProductColor.product_id)
+    )
+    first_images = {}
+    if first_colors:
+        first_image = (
+            db.query(func.min(ProductImage.id).label("id"))
+            .filter(ProductImage.color_id.in_(list(first_colors.values())))
+            .group_by(ProductImage.color_id)
+            .subquery()
+        )
+        first_images = dict(
+            db.query(ProductImage.color_id, ProductImage.image_url)
+            .join(first_image, ProductImage.id == first_image.c.id)
+        )
+
+    result = []
+    for item in items:
+        p = products.get(item.product_id)
+        if p is None:  # product deleted since it was wishlisted
+            continue
+        result.append({
+            "id": item.id,
+            "product_id": p.id,
+            "name": p.name,
+            "price": p.price,
+            "discount_price": p.discount_price,
+            "in_stock": p.in_stock,
+            "thumbnail": first_images.get(first_colors.get(p.id)),
+        })
+    return result
+
 def add_to_wishlist(db: Session, user_id: int, wishlist: schemas.WishlistCreate):
+    """Idempotent: adding a product that is already in the wishlist returns the existing entry."""
+    query = db.query(models.WishlistItem).filter_by(user_id=user_id, product_id=wishlist.product_id)
+    db_item = query.first()
+    if db_item:
+        return db_item
+
     db_item = models.WishlistItem(user_id=user_id, product_id=wishlist.product_id)
     db.add(db_item)
-    db.commit()
+    try:
+        db.commit()
+        invalidate_membership(user_id)
+    except IntegrityError:
+        # a concurrent request added it first (or the product doesn't exist)
+        db.rollback()
+        existing = query.first()
+        if existing is None:
+            raise ValueError("Product not found")
+        return existing
     db.refresh(db_item)
     return db_item
 
@@ -16,5 +91,6 @@ def remove_from_wishlist(db: Session, user_id: int, product_id: int):
     if db_item:
         db.delete(db_item)
         db.commit()
+        invalidate_membership(user_id)
         return True
     return False
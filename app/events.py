@@ -0,0 +1,184 @@
+"""
+In-process pub/sub for pushing updates to connected clients (SSE/WebSocket).
+
+    with hub.subscribe("order:42") as subscription:   # inside a coroutine
+        async for message in subscription:
+            ...
+
+    publish("order:42", {"status": "shipped"})   # from any thread
+
+Subscribers only see messages published in their own process. When the
+API runs on several processes or hosts, set EVENT_BROKER_URL (redis://...)
+so publishes go through a shared broker and every process fans them out
+to its own subscribers.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, hub, topic: str, loop: asyncio.AbstractEventLoop):
+        self.hub = hub
+        self.topic = topic
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def deliver(self, message):
+        # runs on the subscriber's loop; a client too slow to keep up loses
+        # the oldest messages rather than growing memory without bound
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float = None):
+        """Next message, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """Fans messages out to the subscriptions of this process."""
+
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.broker = None
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Start receiving `topic` on the running event loop; close() the result when done."""
+        subscription = Subscription(self, topic, asyncio.get_running_loop())
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish_local(self, topic: str, message):
+        """Deliver to this process's subscribers; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # the subscriber's loop has already shut down
+                pass
+
+    def publish(self, topic: str, message):
+        if self.broker is not None:
+            try:
+                self.broker.publish(topic, message)
+                return
+            except Exception:
+                # pushes are best effort; the data is already committed
+                logger.exception("Event broker publish failed; delivering locally only")
+        self.publish_local(topic, message)
+
+
+class Broker(abc.ABC):
+    """
+    Cross-process transport. `publish` sends a message to every process;
+    `start(hub)` must call `hub.publish_local` for each message received,
+    including this process's own publishes.
+    """
+
+    @abc.abstractmethod
+    def publish(self, topic: str, message):
+        ...
+
+    @abc.abstractmethod
+    def start(self, hub: EventHub):
+        ...
+
+    def stop(self):
+        pass
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub transport; requires the optional `redis` package."""
+
+    CHANNEL_PREFIX = "jokroup:events:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._thread = None
+
+    def publish(self, topic: str, message):
+        self.client.publish(self.CHANNEL_PREFIX + topic, json.dumps(message, default=str))
+
+    def start(self, hub: EventHub):
+        prefix_length = len(self.CHANNEL_PREFIX)
+
+        def relay(item):
+            channel = item["channel"].decode()
+            try:
+                hub.publish_local(channel[prefix_length:], json.loads(item["data"]))
+            except ValueError:
+                logger.warning("Dropping malformed event on %s", channel)
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{self.CHANNEL_PREFIX + "*": relay})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._pubsub.close()
+
+
+hub = EventHub()
+
+
+def start_broker(url: str = None):
+    """Attach the cross-process broker named by EVENT_BROKER_URL, if any."""
+    url = url or os.getenv("EVENT_BROKER_URL")
+    if not url:
+        return None
+    broker = RedisBroker(url)
+    broker.start(hub)
+    hub.broker = broker
+    return broker
+
+
+def stop_broker():
+    if hub.broker is not None:
+        hub.broker.stop()
+        hub.broker = None
+
+
+def publish(topic: str, message):
+    hub.publish(topic, message)
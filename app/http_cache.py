@@ -0,0 +1,269 @@
+"""
+HTTP response cache for public GET routes.
+
+HTTPCacheMiddleware keeps complete responses (status, headers and the
+already-encoded body) for the paths in CACHE_RULES. The key is the method,
+path, normalized query string and the request headers the response varies
+on. It sits outside CompressionMiddleware, so a hit skips the route and
+compression. Accept-Encoding, reduced to the negotiated encoding, is always
+part of the key because the middleware inside may encode per client.
+
+Routes tag their responses with surrogate keys (`set_surrogate_keys`) and
+write routes call `purge("product:42")` after committing. The keys are
+also sent to the CDN in the Surrogate-Key header, together with
+Cache-Control.
+
+Entries live in process memory, so purge() only reaches the current
+worker. For the other workers each rule names the cache_versions rows its
+data depends on, with `{group}` filled in from the path. The versions are
+stored with the entry, and a hit whose versions have since been bumped
+counts as a miss, so a write in any worker invalidates all of them within
+VERSION_CHECK_SECONDS. Versions are re-read at most that often, so hits
+don't touch the database.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.cache import TTLCache, get_versions
+from app.compression import negotiate
+from app.crud.category import CATEGORY_CACHE
+from app.crud.coupon import COUPON_CACHE
+from app.crud.product import PRODUCT_CACHE, PRODUCT_ITEM_CACHE
+from app.database import SessionLocal
+
+# path pattern -> max-age in seconds, cache_versions names (none for static data)
+CACHE_RULES = [
+    (r"/api/v1/cat/list", 300, (CATEGORY_CACHE,)),
+    (r"/api/v1/product/product/(?P<product_id>\d+)", 300, (PRODUCT_CACHE, PRODUCT_ITEM_CACHE)),
+    (r"/api/v1/coupon/", 60, (COUPON_CACHE,)),
+    (r"/api/categories", 3600, ()),
+]
+
+MAX_ENTRY_SIZE = 1024 * 1024
+VERSION_CHECK_SECONDS = 5
+
+# request headers every entry is keyed on
+DEFAULT_VARY = ("accept-encoding",)
+
+
+def set_surrogate_keys(response, *keys):
+    """Tag `response` so purge() of any of `keys` evicts it."""
+    existing = response.headers.get("surrogate-key")
+    response.headers["Surrogate-Key"] = " ".join(([existing] if existing else []) + [str(k) for k in keys])
+    return response
+
+
+# names -> versions, shared by all rules
+version_cache = TTLCache(ttl=VERSION_CHECK_SECONDS, maxsize=4096)
+
+
+def _read_versions(names: tuple) -> tuple:
+    db = SessionLocal()
+    try:
+        return get_versions(db, names)
+    finally:
+        db.close()
+
+
+async def _current_versions(names: tuple) -> tuple:
+    versions = version_cache.get(names)
+    if versions is None:
+        versions = await run_in_threadpool(_read_versions, names)
+        version_cache.set(names, versions)
+    return versions
+
+
+class _Entry:
+    __slots__ = ("status", "headers", "body", "keys", "route", "version", "stored_at", "expires_at")
+
+    def __init__(self, status, headers, body, keys, route, version, max_age):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.keys = keys
+        self.route = route  # the matched route, restored on hits for per-route metrics
+        self.version = version  # of the rule's datasets, read before the route ran
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + max_age
+
+
+class ResponseCache:
+    """LRU of full responses with a surrogate key -> cache keys index."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._by_surrogate = {}
+        self._vary = {}  # base key -> request header names the last stored response varied on
+        self._lock = threading.Lock()
+
+    def vary(self, base_key):
+        return self._vary.get(base_key, DEFAULT_VARY)
+
+    def merge_vary(self, base_key, vary) -> tuple:
+        """
+        Add `vary` to the header names kept for `base_key`. Names are only
+        ever added: a response that doesn't vary must not hide the variants
+        of one that does.
+        """
+        with self._lock:
+            merged = tuple(sorted(set(self._vary.get(base_key, DEFAULT_VARY)) | set(vary)))
+            self._vary[base_key] = merged
+            return merged
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry: _Entry):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for k in entry.keys:
+                self._by_surrogate.setdefault(k, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def purge(self, *surrogate_keys) -> int:
+        """Drop every response tagged with any of `surrogate_keys`; returns how many."""
+        with self._lock:
+            keys = set()
+            for k in surrogate_keys:
+                keys |= self._by_surrogate.pop(str(k), set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_surrogate.clear()
+            self._vary.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for k in entry.keys:
+            tagged = self._by_surrogate.get(k)
+            if tagged is not None:
+                tagged.discard(key)
+                if not tagged:
+                    del self._by_surrogate[k]
+
+
+response_cache = ResponseCache()
+
+
+def purge(*surrogate_keys) -> int:
+    return response_cache.purge(*surrogate_keys)
+
+
+def _vary_value(headers: Headers, name: str):
+    if name == "accept-encoding":
+        return negotiate(headers.get(name, ""))
+    return headers.get(name)
+
+
+class HTTPCacheMiddleware:
+    def __init__(self, app, rules=CACHE_RULES, cache: ResponseCache = response_cache):
+        self.app = app
+        self.rules = [(re.compile(pattern), max_age, versions) for pattern, max_age, versions in rules]
+        self.cache = cache
+
+    def _rule(self, path: str):
+        """(max-age, cache_versions names) for `path`, or None if it isn't cached."""
+        for pattern, max_age, versions in self.rules:
+            match = pattern.fullmatch(path)
+            if match:
+                return max_age, tuple(name.format(**match.groupdict()) for name in versions)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        rule = self._rule(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        max_age, version_names = rule
+        version = await _current_versions(version_names) if version_names else None
+
+        request_headers = Headers(scope=scope)
+        query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        base_key = (scope["method"], scope["path"], query)
+        vary = self.cache.vary(base_key)
+        entry = self.cache.get((base_key, tuple(_vary_value(request_headers, h) for h in vary)))
+        if entry is not None and entry.version == version:
+            scope["route"] = entry.route
+            await self._send_hit(entry, send)
+            return
+
+        start = None
+        chunks = []
+        size = 0
+        cacheable = True
+
+        async def send_wrapper(message):
+            nonlocal start, size, cacheable
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                cacheable = message["status"] == 200 and "set-cookie" not in headers \
+                    and "no-store" not in headers.get("cache-control", "")
+                if cacheable:
+                    if "cache-control" not in headers:
+                        headers["Cache-Control"] = f"public, max-age={max_age}"
+                    headers["X-Cache"] = "MISS"
+                # snapshot: outer middleware may still add per-response headers to this list
+                start = {"status": message["status"], "headers": list(message["headers"])}
+            elif message["type"] == "http.response.body" and cacheable:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > MAX_ENTRY_SIZE:
+                    cacheable = False
+                else:
+                    chunks.append(body)
+                    if not message.get("more_body", False):
+                        self._store(scope, base_key, request_headers, start, b"".join(chunks), version, max_age)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _store(self, scope, base_key, request_headers: Headers, start, body: bytes, version, max_age: int):
+        headers = Headers(raw=start["headers"])
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+        if "*" in vary:
+            return
+        vary = self.cache.merge_vary(base_key, vary)
+        keys = frozenset(headers.get("surrogate-key", "").split())
+        raw = [
+            (k, v) for k, v in start["headers"]
+            if k.lower() not in (b"x-cache", b"content-length")
+        ]
+        key = (base_key, tuple(_vary_value(request_headers, h) for h in vary))
+        self.cache.set(key, _Entry(start["status"], raw, body, keys, scope.get("route"), version, max_age))
+
+    async def _send_hit(self, entry: _Entry, send):
+        age = int(time.monotonic() - entry.stored_at)
+        headers = list(entry.headers) + [
+            (b"content-length", str(len(entry.body)).encode()),
+            (b"age", str(age).encode()),
+            (b"x-cache", b"HIT"),
+        ]
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
@@ -0,0 +1,207 @@
+import hashlib
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.database import SessionLocal
+from app.models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# orders (checkout + tracking updates) and cart mutations; matched by whole path segments
+IDEMPOTENT_PATH_PREFIXES = ("/api/orders", "/cart")
+KEY_TTL = timedelta(hours=24)
+# an unfinished request older than this is presumed dead (worker crashed) and its key can be reclaimed
+IN_PROGRESS_LEASE = timedelta(seconds=60)
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL_SECONDS = 600
+
+_last_purge = 0.0
+
+
+def _sha256(*parts: bytes) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _path_matches(path: str, prefixes) -> bool:
+    """True when `path` is one of `prefixes` or below it ("/cart/1" but not "/cartfoo")."""
+    for prefix in prefixes:
+        prefix = prefix.rstrip("/")
+        if path == prefix or path.startswith(prefix + "/"):
+            return True
+    return False
+
+
+def _purge_expired(db, now: datetime):
+    """Drop expired keys, at most once every PURGE_INTERVAL_SECONDS per worker."""
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = time.monotonic()
+    db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < now).delete(synchronize_session=False)
+    db.commit()
+
+
+def begin_request(key: str, request_hash: str, ttl: timedelta = KEY_TTL):
+    """
+    Claim `key` for a new request.
+
+    Returns None when the caller should run the handler, otherwise the stored
+    IdempotencyKey row (finished or still in progress). A key whose first
+    request never finished within IN_PROGRESS_LEASE is taken over.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        _purge_expired(db, now)
+        try:
+            db.add(IdempotencyKey(key=key, request_hash=request_hash, expires_at=now + ttl))
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+
+        # expired, or abandoned mid-request; the conditional UPDATE lets only one retry win
+        reclaimed = (
+            db.query(IdempotencyKey)
+            .filter(
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.expires_at < now,
+                    and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at < now - IN_PROGRESS_LEASE),
+                ),
+            )
+            .update(
+                {
+                    IdempotencyKey.request_hash: request_hash,
+                    IdempotencyKey.status_code: None,
+                    IdempotencyKey.content_type: None,
+                    IdempotencyKey.body: None,
+                    IdempotencyKey.created_at: now,
+                    IdempotencyKey.expires_at: now + ttl,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if reclaimed:
+            return None
+
+        record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if record is None:
+            # the previous attempt failed and released the key in the meantime
+            return None
+        db.expunge(record)
+        return record
+    finally:
+        db.close()
+
+
+def finish_request(key: str, status_code: int, content_type: str, body: bytes):
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update(
+            {
+                IdempotencyKey.status_code: status_code,
+                IdempotencyKey.content_type: content_type,
+                IdempotencyKey.body: zlib.compress(body),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def release_request(key: str):
+    """Forget a key whose request failed, so the client can retry it."""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Replays the first response for a repeated `Idempotency-Key` instead of
+    running the handler again. Keys are scoped to the caller's Authorization
+    header, method and path; reusing a key with a different payload is a 422.
+    Server errors release the key so the retry is executed for real.
+    """
+
+    def __init__(self, app, path_prefixes=IDEMPOTENT_PATH_PREFIXES, ttl: timedelta = KEY_TTL):
+        super().__init__(app)
+        self.path_prefixes = tuple(path_prefixes)
+        self.ttl = ttl
+
+    async def dispatch(self, request: Request, call_next):
+        client_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if (
+            not client_key
+            or request.method not in IDEMPOTENT_METHODS
+            or not _path_matches(request.url.path, self.path_prefixes)
+        ):
+            return await call_next(request)
+
+        if len(client_key) > MAX_KEY_LENGTH:
+            return JSONResponse(status_code=400, content={"detail": f"{IDEMPOTENCY_HEADER} is too long"})
+
+        body = await request.body()
+        key = _sha256(
+            request.headers.get("authorization", "").encode(),
+            request.method.encode(),
+            request.url.path.encode(),
+            client_key.encode(),
+        )
+        request_hash = _sha256(request.url.query.encode(), body)
+
+        record = await run_in_threadpool(begin_request, key, request_hash, self.ttl)
+        if record is not None:
+            if record.request_hash != request_hash:
+                return JSONResponse(
+                    status_code=422,
+                    content={"detail": f"{IDEMPOTENCY_HEADER} was already used with a different request"},
+                )
+            if record.status_code is None:
+                return JSONResponse(
+                    status_code=409,
+                    content={"detail": "A request with this idempotency key is still in progress"},
+                )
+            return Response(
+                content=zlib.decompress(record.body) if record.body else b"",
+                status_code=record.status_code,
+                media_type=record.content_type,
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        try:
+            response = await call_next(request)
+            response_body = b"".join([chunk async for chunk in response.body_iterator])
+        except Exception:
+            await run_in_threadpool(release_request, key)
+            raise
+
+        if response.status_code >= 500:
+            await run_in_threadpool(release_request, key)
+        else:
+            await run_in_threadpool(
+                finish_request, key, response.status_code, response.headers.get("content-type"), response_body
+            )
+
+        replay = Response(content=response_body, status_code=response.status_code, background=response.background)
+        replay.raw_headers = response.raw_headers
+        return replay
@@ -0,0 +1,266 @@
+"""
+Background jobs backed by the `jobs` table.
+
+Code registers a handler for a job kind and enqueues work from a request:
+
+    @job_handler("product_import")
+    def run_import(db, payload, progress):
+        ...
+        progress(0.5, "halfway")
+        return {"inserted": 10}
+
+    job = enqueue(db, "product_import", {"path": path})
+
+`job_handler(kind, on_failure=fn)` also registers `fn(payload)`, called once
+when a job of that kind fails for good (e.g. to delete its input file).
+
+Workers claim due jobs with a conditional UPDATE, so any number of threads
+and processes can share the table without an external broker. Failed jobs
+are retried with exponential backoff until max_attempts is reached.
+Workers run inside the API process (JOB_WORKERS, default 1; 0 disables
+them) or on their own via `python run.py worker`.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+POLL_INTERVAL_SECONDS = 1.0
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+# a running job that hasn't reported progress for this long is assumed dead
+LOCK_TIMEOUT = timedelta(minutes=15)
+# how often each worker looks for such jobs
+REQUEUE_INTERVAL_SECONDS = 60
+
+_handlers = {}
+_failure_handlers = {}
+
+
+def job_handler(kind: str, on_failure=None):
+    """Register `fn(db, payload, progress)` as the handler for jobs of `kind`."""
+    def register(fn):
+        _handlers[kind] = fn
+        if on_failure is not None:
+            _failure_handlers[kind] = on_failure
+        return fn
+    return register
+
+
+def _failed_for_good(job: Job):
+    """Run the kind's on_failure cleanup; errors there are logged, never raised."""
+    cleanup = _failure_handlers.get(job.kind)
+    if cleanup is None:
+        return
+    try:
+        cleanup(job.payload or {})
+    except Exception:
+        logger.exception("Cleanup for failed job %s (%s) failed", job.id, job.kind)
+
+
+def enqueue(db: Session, kind: str, payload: dict = None, max_attempts: int = 3, delay_seconds: float = 0) -> Job:
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        status="queued",
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (1-based), with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def report_progress(job_id: int, progress: float, message: str = None):
+    """Store progress (0.0 - 1.0) for a running job; also refreshes its lock."""
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id, Job.status == "running").update(
+            {
+                Job.progress: max(0.0, min(progress, 1.0)),
+                Job.message: message[:255] if message else None,
+                Job.locked_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Put back running jobs whose worker stopped reporting (crash, kill -9);
+    ones that have used all their attempts are failed instead.
+    """
+    now = datetime.utcnow()
+    stale = (Job.status == "running", Job.locked_at < now - LOCK_TIMEOUT)
+    count = (
+        db.query(Job)
+        .filter(*stale, Job.attempts < Job.max_attempts)
+        .update({Job.status: "queued", Job.locked_by: None, Job.run_after: now}, synchronize_session=False)
+    )
+    exhausted = db.query(Job).filter(*stale).all()
+    for job in exhausted:
+        job.status = "failed"
+        job.locked_by = None
+        job.error = job.error or "Worker stopped while running the job"
+        job.finished_at = now
+    db.commit()
+    for job in exhausted:
+        _failed_for_good(job)
+    return count + len(exhausted)
+
+
+def claim_job(worker_id: str):
+    """Atomically mark the oldest due job as running for `worker_id`; returns its id or None."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        candidates = [
+            id_ for (id_,) in db.query(Job.id)
+            .filter(Job.status == "queued", Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .limit(5)
+        ]
+        for job_id in candidates:
+            claimed = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status == "queued")
+                .update(
+                    {
+                        Job.status: "running",
+                        Job.locked_by: worker_id,
+                        Job.locked_at: now,
+                        Job.attempts: Job.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if claimed:
+                return job_id
+        return None
+    finally:
+        db.close()
+
+
+def run_job(job_id: int):
+    """Run a claimed job and record its outcome, scheduling a retry on failure."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        handler = _handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{job.kind}'")
+            result = handler(db, job.payload or {}, lambda p, m=None: report_progress(job_id, p, m))
+        except Exception as e:
+            db.rollback()
+            logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+            job = db.query(Job).filter(Job.id == job_id).first()
+            job.error = "".join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+            job.locked_by = None
+            if job.attempts < job.max_attempts and handler is not None:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+            else:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+            db.commit()
+            if job.status == "failed":
+                _failed_for_good(job)
+            return
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        job.status = "succeeded"
+        job.progress = 1.0
+        job.result = result
+        job.error = None
+        job.locked_by = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobWorker:
+    """A small pool of polling threads that claim and run jobs."""
+
+    def __init__(self, threads: int = JOB_WORKERS, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _requeue_stale(self):
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db)
+        finally:
+            db.close()
+
+    def start(self):
+        self._requeue_stale()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(f"{self.worker_id}:{i}",), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self, worker_id: str):
+        next_requeue = time.monotonic() + REQUEUE_INTERVAL_SECONDS
+        while not self._stop.is_set():
+            try:
+                # keep checking for jobs orphaned by other workers, not only at startup
+                if time.monotonic() >= next_requeue:
+                    next_requeue = time.monotonic() + REQUEUE_INTERVAL_SECONDS
+                    self._requeue_stale()
+                job_id = claim_job(worker_id)
+                if job_id is not None:
+                    run_job(job_id)
+                    continue
+            except Exception:
+                logger.exception("Job worker %s error", worker_id)
+            self._stop.wait(self.poll_interval)
+
+
+def run_workers(threads: int = None):
+    """Blocking entry point for a dedicated worker process (`python run.py worker`)."""
+    worker = JobWorker(threads=threads or max(JOB_WORKERS, 1))
+    stopped = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopped.set())
+    worker.start()
+    print(f"Job worker {worker.worker_id} running {worker.threads} thread(s)")
+    while not stopped.wait(1.0):
+        pass
+    worker.stop()
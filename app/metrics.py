@@ -0,0 +1,269 @@
+"""
+Request and database metrics in the Prometheus text format.
+
+MetricsMiddleware records, per route template (`/api/v1/product/product/{product_id}`,
+never the raw path), request counts by status, a latency histogram and
+how many queries and how much DB time each request took. instrument_engine()
+hooks SQLAlchemy cursor events for the global query counters, and
+InstrumentedQueuePool times how long checkouts wait for a free connection.
+Pool size, checked-out connections and overflow in use are read when
+/metrics is scraped.
+
+Recording is a dict lookup and a few integer adds under a lock, so the
+per-request cost is a few microseconds.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Bearer token required on /metrics when set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one computed at scrape time when `func` is given."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, func=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+        self.func = func
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def collect(self):
+        lines = self.header()
+        if self.func is not None:
+            values = list(self.func())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+registry = []
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being handled.")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries per request.", ("route",), buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Database time per request.", ("route",))
+QUERIES = Counter("db_queries_total", "SQL statements executed.")
+QUERY_TIME = Histogram("db_query_duration_seconds", "SQL statement execution time.", buckets=QUERY_BUCKETS)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",), buckets=WAIT_BUCKETS,
+)
+
+_engines = []
+
+
+def _pool_stats(attr):
+    def collect():
+        for name, engine in _engines:
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                yield (name,), getattr(pool, attr)()
+    return collect
+
+
+Gauge("db_pool_size", "Configured pool size.", ("engine",), func=_pool_stats("size"))
+Gauge("db_pool_checked_out", "Connections currently checked out.", ("engine",), func=_pool_stats("checkedout"))
+Gauge(
+    "db_pool_overflow", "Overflow connections in use (negative while the pool is not yet full).",
+    ("engine",), func=_pool_stats("overflow"),
+)
+
+# [queries, seconds] for the request being handled in this context
+_request_db = ContextVar("request_db", default=None)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    engine_label = "primary"
+
+    @classmethod
+    def labelled(cls, engine_label: str):
+        """A subclass reporting under `engine_label`; a class attribute survives pool recreate()."""
+        return type(cls.__name__, (cls,), {"engine_label": engine_label})
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start, self.engine_label)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERIES.inc()
+    QUERY_TIME.observe(elapsed)
+    stats = _request_db.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def instrument_engine(engine, name: str = "primary"):
+    if any(e is engine for _, e in _engines):
+        return
+    _engines.append((name, engine))
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.dec()
+            _request_db.reset(token)
+            # the matched route template keeps label cardinality bounded
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "<unmatched>"
+            REQUESTS.inc(scope["method"], route, str(status))
+            LATENCY.observe(elapsed, scope["method"], route)
+            REQUEST_QUERIES.observe(stats[0], route)
+            REQUEST_DB_TIME.observe(stats[1], route)
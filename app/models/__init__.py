@@ -2,16 +2,17 @@ from .user import User
 from .product import Product
 from .category import Category, SubCategory
 from .address import Address
-from .coupon import Coupon
+from .coupon import Coupon, CouponRedemption
 #from .category  import
-from .cart import CartItem
+from .cart import CartItem, WishlistItem
+from .order import Order, OrderItem, OrderTracking
+from .idempotency import IdempotencyKey
+from .cache import CacheVersion
+from .analytics import DailyOrderStats, DailyCategorySales, RollupWatermark
+from .job import Job
 
 from .user import User, UserSettings
 
 
-class Order:
-    pass
-
-
 class Customer:
     pass
\ No newline at end of file
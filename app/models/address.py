@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, ForeignKey, Integer, Index
 
 
 from sqlalchemy.orm import relationship
@@ -6,6 +6,10 @@ from app.database import Base
 
 class Address(Base):
     __tablename__ = "addresses"
+    __table_args__ = (
+        # a user's address book, and their default address, are index lookups
+        Index("ix_addresses_user_default", "user_id", "default"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(250))
     line1 = Column(String(250))
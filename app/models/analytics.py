@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, Float, Date, String, ForeignKey
+from app.database import Base
+
+# Pre-aggregated analytics, maintained incrementally by app.crud.analytics.refresh_rollups.
+# Days are UTC calendar days.
+
+class DailyOrderStats(Base):
+    __tablename__ = "daily_order_stats"
+
+    day = Column(Date, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    new_users = Column(Integer, nullable=False, default=0)
+
+
+class DailyCategorySales(Base):
+    __tablename__ = "daily_category_sales"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+
+class RollupWatermark(Base):
+    """Highest source row id already folded into the rollups, per source table."""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(100), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
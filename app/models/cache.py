@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, Integer
+from app.database import Base
+
+class CacheVersion(Base):
+    """Version counter per cached dataset, bumped on every write so other workers can tell their copy is stale."""
+    __tablename__ = "cache_versions"
+
+    name = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, UniqueConstraint, Index
 from app.database import Base
 from datetime import datetime
 
 class Coupon(Base):
     __tablename__ = "coupons"
+    __table_args__ = (
+        # serves the "currently redeemable" listing filter
+        Index("ix_coupons_active_valid", "active", "valid_to", "valid_from"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(250), unique=True, nullable=False, index=True)
@@ -14,5 +18,24 @@ class Coupon(Base):
     valid_from = Column(DateTime, nullable=False, default=datetime.utcnow)
     valid_to = Column(DateTime, nullable=False)
     max_uses = Column(Integer, nullable=True)  # nullable for unlimited usage
+    max_uses_per_user = Column(Integer, nullable=True)  # nullable for unlimited usage
     used_count = Column(Integer, default=0)
     active = Column(Boolean, default=True)
+
+
+class CouponRedemption(Base):
+    __tablename__ = "coupon_redemptions"
+    __table_args__ = (
+        # use_number is the user's n-th use of the coupon; two concurrent
+        # redemptions racing for the same slot collide on this constraint
+        UniqueConstraint("coupon_id", "user_id", "use_number", name="uq_coupon_redemption_use"),
+        Index("ix_coupon_redemptions_coupon_user", "coupon_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    coupon_id = Column(Integer, ForeignKey("coupons.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    use_number = Column(Integer, nullable=False, default=1)
+    discount = Column(Float, default=0.0)
+    redeemed_at = Column(DateTime, default=datetime.utcnow)
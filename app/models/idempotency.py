@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from app.database import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 of caller + method + path + client key, so keys can't collide across users
+    key = Column(String(64), unique=True, nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    content_type = Column(String(100), nullable=True)
+    body = Column(LargeBinary(length=2 ** 24), nullable=True)  # zlib-compressed response body
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -9,19 +9,53 @@ class Order(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # ✅ Fix added here
     status = Column(String(50), default="processing")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Totals are snapshotted at checkout so later price changes don't alter past orders
+    subtotal = Column(Float, default=0.0)
+    discount = Column(Float, default=0.0)
+    total = Column(Float, default=0.0)
+    coupon_code = Column(String(250), nullable=True)
+    # the address book entry used at checkout; shipping_address is its snapshot,
+    # so editing or deleting the entry later doesn't change where the order went
+    address_id = Column(Integer, ForeignKey("addresses.id", ondelete="SET NULL"), nullable=True)
+    shipping_address = Column(JSON, nullable=True)
 
     tracking_updates = relationship("OrderTracking", back_populates="order")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     user = relationship("User", back_populates="orders")  # ✅ Add this line
 
 
+# a customer's order history, newest first, is one index range scan
+Index("ix_orders_user_created_at", Order.user_id, Order.created_at.desc())
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
+    product_name = Column(String(255), nullable=False)  # snapshot
+    unit_price = Column(Float, nullable=False)  # snapshot
+    quantity = Column(Integer, nullable=False)
+    line_total = Column(Float, nullable=False)
+
+    order = relationship("Order", back_populates="items")
+
+
 class OrderTracking(Base):
     __tablename__ = "order_tracking"
+    __table_args__ = (
+        # an order's timeline is one range scan
+        Index("ix_order_tracking_order_timestamp", "order_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
     status = Column(String(50))
     message = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    event_id = Column(String(100), unique=True, nullable=True)  # carrier scan id, for de-duplication
 
     order = relationship("Order", back_populates="tracking_updates")
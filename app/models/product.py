@@ -9,6 +9,7 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
+    sku = Column(String(100), unique=True, index=True, nullable=True)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Float, nullable=False)
@@ -21,6 +22,7 @@ class Product(Base):
     sizes = Column(JSON, nullable=True)
 
     in_stock = Column(Boolean, default=True)
+    stock = Column(Integer, nullable=True)  # None = stock not tracked for this product
     rating = Column(Float, default=0.0)
     reviews = Column(Integer, default=0)
     featured = Column(Boolean, default=False)
@@ -42,7 +44,7 @@ class ProductColor(Base):
     __tablename__ = "product_colors"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), index=True)
     color_name = Column(String(50), nullable=False)
 
     product = relationship("Product", back_populates="product_colors")
@@ -53,7 +55,7 @@ class ProductImage(Base):
     __tablename__ = "product_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    color_id = Column(Integer, ForeignKey("product_colors.id", ondelete="CASCADE"))
+    color_id = Column(Integer, ForeignKey("product_colors.id", ondelete="CASCADE"), index=True)
     image_url = Column(String(255), nullable=False)
 
     color = relationship("ProductColor", back_populates="images")
@@ -0,0 +1,65 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Union
+
+from fastapi import Response
+from sqlalchemy import and_, or_
+
+
+def keyset_page(query, pk, after: Optional[int], limit: int):
+    """
+    One page of `query` ordered by the integer key `pk`, starting after `after`.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page. Unlike
+    OFFSET, every page is a single index range scan however deep it is.
+    """
+    if after is not None:
+        query = query.filter(pk > after)
+    rows = query.order_by(pk).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], pk.key)
+    return rows, None
+
+
+def set_page_headers(response: Response, next_cursor: Optional[Union[int, str]], total: Optional[int] = None):
+    """Pagination metadata goes in headers so list bodies stay plain JSON arrays."""
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+def encode_cursor(created_at: datetime, id_: int) -> str:
+    """Opaque cursor for (timestamp, id) keyset pages."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id_}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id_ = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(id_)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_page_desc(query, time_column, pk, cursor: Optional[str], limit: int):
+    """
+    Newest-first page of `query` ordered by (time_column, pk) descending.
+
+    The cursor condition is spelled out as an OR rather than a row-value
+    comparison so MySQL can use a (…, time_column) index range for it.
+    Returns (rows, next_cursor).
+    """
+    if cursor:
+        created_at, id_ = decode_cursor(cursor)
+        query = query.filter(or_(time_column < created_at, and_(time_column == created_at, pk < id_)))
+    rows = query.order_by(time_column.desc(), pk.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(getattr(last, time_column.key), getattr(last, pk.key))
+    return rows, None
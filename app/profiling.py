@@ -0,0 +1,154 @@
+"""
+Per-request SQL profiling, switched on with SQL_PROFILE=1.
+
+SQLProfileMiddleware gives each request a RequestProfile. The cursor
+hooks from profile_engine() time every statement and record it in the
+profile under its normalized shape: literals and IN lists collapsed, so
+`WHERE id = 7` and `WHERE id = 8` count as the same statement. At the end
+of the request the profile:
+
+- logs statements slower than SLOW_QUERY_MS to the `app.sql.slow` logger,
+  which also writes to the SLOW_QUERY_LOG file when that is set;
+- flags N+1 patterns, i.e. a shape repeated N_PLUS_ONE_THRESHOLD or more
+  times in one request, on the `app.sql.nplus1` logger;
+- adds a Server-Timing header (`db;dur=12.4;desc="9 queries", app;dur=30.1`)
+  that shows up in the browser's network panel.
+
+Every statement is also logged with its duration at DEBUG on `app.sql`,
+which replaces SQLAlchemy's echo (SQL_ECHO=1 still turns that on).
+"""
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+
+logger = logging.getLogger("app.sql")
+slow_logger = logging.getLogger("app.sql.slow")
+nplus1_logger = logging.getLogger("app.sql.nplus1")
+
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_logger.addHandler(_handler)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\([^)]+\)s|%s|\?|:\w+")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\(\s*[?, ]*\))(?:\s*,\s*\(\s*[?, ]*\))*", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """The statement's shape: literals and parameters become ?, IN/VALUES lists one group."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (?)", shape)
+    shape = _VALUES_LIST.sub(r"VALUES \1", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    __slots__ = ("scope", "started", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.queries = []  # (shape, seconds)
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+    def record(self, statement: str, elapsed: float):
+        shape = normalize(statement)
+        self.queries.append((shape, elapsed))
+        self.db_time += elapsed
+        logger.debug("%s %.1fms %s", self.route, elapsed * 1000, shape)
+
+    def server_timing(self) -> str:
+        app_ms = (time.perf_counter() - self.started) * 1000
+        return f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries", app;dur={app_ms:.1f}'
+
+    def report(self, method: str):
+        route = self.route
+        repeated = {}
+        for shape, elapsed in self.queries:
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                slow_logger.warning("%s %s %.1fms %s", method, route, elapsed * 1000, shape)
+            count, total = repeated.get(shape, (0, 0.0))
+            repeated[shape] = (count + 1, total + elapsed)
+        for shape, (count, total) in repeated.items():
+            if count >= N_PLUS_ONE_THRESHOLD:
+                nplus1_logger.warning(
+                    "%s %s ran the same statement %d times (%.1fms): %s",
+                    method, route, count, total * 1000, shape,
+                )
+
+
+_profile = ContextVar("sql_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+    profile = _profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    elif elapsed * 1000 >= SLOW_QUERY_MS:
+        # outside a request: job workers, startup
+        slow_logger.warning("- - %.1fms %s", elapsed * 1000, normalize(statement))
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("profile_start"):
+        context.connection.info["profile_start"].pop()
+
+
+def profile_engine(engine):
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class SQLProfileMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        token = _profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", profile.server_timing())
+                headers["Timing-Allow-Origin"] = "*"  # lets the frontend's origin read the timings
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            profile.report(scope["method"])
@@ -1,15 +1,59 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.authentication import get_current_user
 from app.crud import address as address_crud
+from app.models import User
 from app.schemas import address as address_schema
 
 router = APIRouter()
 
 @router.post("/", response_model=address_schema.AddressOut)
-def create_address(address: address_schema.AddressCreate, db: Session = Depends(get_db)):
-    return address_crud.create_address(db, address)
+def create_address(
+    address: address_schema.AddressCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Adds an address for the current user; the first one becomes the default."""
+    return address_crud.create_address(db, current_user.id, address)
 
 @router.get("/", response_model=list[address_schema.AddressOut])
-def read_addresses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return address_crud.get_addresses(db, skip=skip, limit=limit)
+def read_addresses(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """The current user's addresses, default first."""
+    return address_crud.get_addresses(db, current_user.id)
+
+@router.get("/default", response_model=address_schema.AddressOut)
+def read_default_address(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    address = address_crud.get_default_address(db, current_user.id)
+    if not address:
+        raise HTTPException(status_code=404, detail="No default address")
+    return address
+
+@router.put("/{address_id}", response_model=address_schema.AddressOut)
+def update_address(
+    address_id: int,
+    changes: address_schema.AddressUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    address = address_crud.update_address(db, current_user.id, address_id, changes)
+    if not address:
+        raise HTTPException(status_code=404, detail="Address not found")
+    return address
+
+@router.put("/{address_id}/default", response_model=address_schema.AddressOut)
+def set_default_address(address_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    address = address_crud.set_default_address(db, current_user.id, address_id)
+    if not address:
+        raise HTTPException(status_code=404, detail="Address not found")
+    return address
+
+@router.delete("/{address_id}")
+def delete_address(address_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    try:
+        deleted = address_crud.delete_address(db, current_user.id, address_id)
+    except address_crud.AddressInUse as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Address not found")
+    return {"detail": "Address deleted"}
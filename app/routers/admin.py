@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+import os
+from fastapi import APIRouter, Depends, HTTPException, Form, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.authentication import create_access_token, get_current_user, verify_password
+from app import cpu_profiler
+from app.authentication import create_access_token, get_current_admin_user, get_current_user, verify_password
 from app.database import get_db
 from app.models import User
 from app.crud import user as crud
@@ -23,3 +26,26 @@ def login_admin(
 @router.get("/me", response_model=UserOut)
 def get_admin_me(user: User = Depends(get_current_user)):
     return user
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+def profile_cpu(
+    seconds: float = Query(10, gt=0, le=cpu_profiler.MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    idle: bool = False,
+    admin: User = Depends(get_current_admin_user),
+):
+    """
+    Sample this worker's Python stacks for `seconds` and return them as
+    collapsed stacks (flamegraph.pl / speedscope input). Only the worker
+    that serves the request is profiled; blocked threads are left out
+    unless `idle=true`.
+    """
+    try:
+        sampler = cpu_profiler.sample(seconds, interval_ms / 1000, include_idle=idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(sampler.collapsed(), headers={
+        "Content-Disposition": f'attachment; filename="cpu-{os.getpid()}.collapsed"',
+        "X-Worker-Pid": str(os.getpid()),
+        "X-Profile-Samples": str(sampler.samples),
+    })
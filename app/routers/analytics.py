@@ -1,69 +1,98 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from app.database import get_db
 from app.models import Order, User
+from app.crud import analytics as analytics_crud
+from app.authentication import get_current_admin_user
+from app.jobs import enqueue
 
 router = APIRouter(prefix="/api/admin/analytics", tags=["Admin Analytics"])
 
-# ---------------- Admin Auth Placeholder ----------------
-def get_current_admin_user():
-    # Implement your auth here
-    return True
+# ---------------- Rollup Refresh ----------------
+@router.post("/refresh")
+def refresh_analytics(
+    background: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_admin_user),
+):
+    """
+    Folds orders/users created since the last run into the rollup tables.
+    With ?background=true the refresh is queued as a job instead.
+    """
+    if background:
+        job = enqueue(db, "analytics_refresh")
+        return {"job_id": job.id, "status": job.status}
+    return analytics_crud.refresh_rollups(db)
 
 # ---------------- Monthly Orders ----------------
 @router.get("/monthly-orders")
 def get_monthly_orders(db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
     """
-    Returns number of orders per month.
+    Returns number of orders (and revenue / new users) per month, from the daily rollup.
     """
-    result = (
-        db.query(
-            func.date_format(Order.created_at, "%Y-%m").label("month"),
-            func.count(Order.id).label("orders")
-        )
-        .group_by("month")
-        .order_by("month")
-        .all()
-    )
-    return [{"month": r.month, "orders": r.orders} for r in result]
+    analytics_crud.maybe_refresh_rollups(db)
+    return analytics_crud.get_monthly_stats(db)
 
 # ---------------- Daily Orders (last 7 days) ----------------
 @router.get("/daily-orders")
-def get_daily_orders(db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
+def get_daily_orders(days: int = Query(7, ge=1, le=366), db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
     """
-    Returns number of orders per day for the last 7 days.
+    Returns number of orders (and revenue / new users) per day for the last `days` days.
     """
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    result = (
-        db.query(
-            func.date_format(Order.created_at, "%Y-%m-%d").label("day"),
-            func.count(Order.id).label("orders")
-        )
-        .filter(Order.created_at >= seven_days_ago)
-        .group_by("day")
-        .order_by("day")
-        .all()
-    )
-    return [{"day": r.day, "orders": r.orders} for r in result]
+    analytics_crud.maybe_refresh_rollups(db)
+    end = datetime.utcnow().date()
+    return analytics_crud.get_daily_stats(db, end - timedelta(days=days - 1), end)
+
+# ---------------- Category Sales ----------------
+@router.get("/category-sales")
+def get_category_sales(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
+    """
+    Returns units sold and revenue per category for the last `days` days.
+    """
+    analytics_crud.maybe_refresh_rollups(db)
+    end = datetime.utcnow().date()
+    return analytics_crud.get_category_sales(db, end - timedelta(days=days - 1), end)
+
+# ---------------- Hourly Orders (live) ----------------
+@router.get("/hourly-orders")
+def get_hourly_orders(hours: int = Query(24, ge=1, le=168), db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
+    """
+    Returns orders and revenue per hour for the last `hours` hours, read live from orders.
+    """
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    buckets = analytics_crud.time_buckets(end - timedelta(hours=hours), end, timedelta(hours=1))
+    return analytics_crud.count_orders_by_bucket(db, buckets)
 
 # ---------------- Top Customers ----------------
 @router.get("/top-customers")
-def get_top_customers(db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
+def get_top_customers(days: int = Query(30, ge=1, le=3660), db: Session = Depends(get_db), current_user=Depends(get_current_admin_user)):
     """
-    Returns top 10 customers based on number of orders.
+    Returns top 10 customers based on number of orders in the last `days` days.
     """
+    since = datetime.utcnow() - timedelta(days=days)
     result = (
         db.query(
             User.id,
-            User.name,
-            func.count(Order.id).label("orders")
+            User.first_name,
+            User.last_name,
+            func.count(Order.id).label("orders"),
+            func.sum(Order.total).label("revenue"),
         )
         .join(Order, Order.user_id == User.id)
-        .group_by(User.id)
+        .filter(Order.created_at >= since)
+        .group_by(User.id, User.first_name, User.last_name)
         .order_by(func.count(Order.id).desc())
         .limit(10)
         .all()
     )
-    return [{"id": r.id, "name": r.name, "orders": r.orders} for r in result]
+    return [
+        {
+            "id": r.id,
+            "name": " ".join(filter(None, [r.first_name, r.last_name])),
+            "orders": r.orders,
+            "revenue": round(r.revenue or 0.0, 2),
+        }
+        for r in result
+    ]
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, Form, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, Form, File
+from sqlalchemy.orm import Session, selectinload
 import os, shutil
 from typing import List
 
 from app.database import get_db
 from app import models, schemas
+from app.cache import TTLCache, bump_version, get_version
+from app.compression import PrecompressedBody
+from app.crud.category import CATEGORY_CACHE
+from app.http_cache import purge, set_surrogate_keys
 from app.models import Category
 from app.schemas import category as category_schema
+from app.serialization import dump_json
 from app.authentication import get_current_admin_user # ✅ Your auth logic
 
 router = APIRouter()
 
+# the public category tree, keyed by category data version; stored with its compressed variants
+category_tree_cache = TTLCache(ttl=300, maxsize=4)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "..", "static", "products")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -42,7 +50,9 @@ def create_category(
     image_path = f"products/{file_name}"
     new_category = models.Category(name=name, slug=slug, image=image_path)
     db.add(new_category)
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge("categories")
     db.refresh(new_category)
 
     return {
@@ -55,8 +65,21 @@ def create_category(
 
 # ✅ Public
 @router.get("/list", response_model=List[schemas.CategoryOut])
-def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(models.Category).all()
+def get_categories(request: Request, db: Session = Depends(get_db)):
+    key = get_version(db, CATEGORY_CACHE)
+    cached = category_tree_cache.get(key)
+    if cached is None:
+        tree = _category_tree(db)
+        cached = (
+            PrecompressedBody(dump_json(List[schemas.CategoryOut], tree)),
+            ["categories"] + [f"category:{c['id']}" for c in tree],
+        )
+        category_tree_cache.set(key, cached)
+    body, surrogate_keys = cached
+    return set_surrogate_keys(body.response(request.headers.get("accept-encoding", "")), *surrogate_keys)
+
+def _category_tree(db: Session):
+    categories = db.query(models.Category).options(selectinload(models.Category.subcategories)).all()
     response = []
 
     for cat in categories:
@@ -116,7 +139,9 @@ def update_category(
 
         category.image = f"products/{file_name}"
 
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge(f"category:{category_id}")
     db.refresh(category)
 
     return {
@@ -151,7 +176,9 @@ def delete_category(
             os.remove(image_path)
 
     db.delete(category)
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge(f"category:{category_id}")
     return {"detail": "Category deleted"}
 
 # --- SUBCATEGORY ROUTES ---
@@ -169,7 +196,9 @@ def create_subcategory(
 
     new_sub = models.SubCategory(**subcategory.dict())
     db.add(new_sub)
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge(f"category:{subcategory.category_id}")
     db.refresh(new_sub)
 
     return {
@@ -210,7 +239,9 @@ def update_subcategory(
 
     sub.name = sub_data.name
     sub.slug = sub_data.slug
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge(f"category:{sub.category_id}")
     db.refresh(sub)
     return {
         "id": sub.id,
@@ -232,6 +263,9 @@ def delete_subcategory(
     if not sub:
         raise HTTPException(status_code=404, detail="SubCategory not found")
 
+    category_id = sub.category_id
     db.delete(sub)
+    bump_version(db, CATEGORY_CACHE)
     db.commit()
+    purge(f"category:{category_id}")
     return {"detail": "SubCategory deleted"}
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app import crud
+from app import crud, models
+from app.cache import TTLCache
+from app.http_cache import purge, set_surrogate_keys
+from app.pagination import set_page_headers
+from app.streaming import stream_rows
 from app.schemas import coupon as coupon_schema
-from app.authentication import get_current_admin_user  # ✅
+from app.authentication import get_current_admin_user, get_current_user  # ✅
 
 router = APIRouter()
 
+# public listing pages, keyed by coupon data version so any coupon write invalidates them
+public_coupon_cache = TTLCache(ttl=60, maxsize=256)
+
 # ✅ Protected: Admin-only
 @router.post("/", response_model=coupon_schema.CouponOut)
 def create_coupon(
@@ -18,12 +26,79 @@ def create_coupon(
     db_coupon = crud.coupon.get_coupon_by_code(db, code=coupon.code)
     if db_coupon:
         raise HTTPException(status_code=400, detail="Coupon code already exists.")
-    return crud.coupon.create_coupon(db, coupon=coupon)
+    db_coupon = crud.coupon.create_coupon(db, coupon=coupon)
+    crud.coupon.coupon_index.load(db)
+    purge("coupons")
+    return db_coupon
+
+# ✅ Public: currently redeemable coupons only.
+# Pass the X-Next-Cursor header value back as `after` for the next page;
+# X-Total-Count is sent with the first page.
+@router.get("/", response_model=list[coupon_schema.CouponPublicOut])
+def read_coupon(
+    response: Response,
+    after: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    key = (crud.coupon.coupon_index.version(db), after, limit)
+    page = public_coupon_cache.get(key)
+    if page is None:
+        coupons, next_cursor = crud.coupon.get_coupon(db, after_id=after, limit=limit, redeemable=True)
+        total = crud.coupon.count_coupons(db, redeemable=True) if after is None else None
+        items = [coupon_schema.CouponPublicOut.model_validate(c).model_dump() for c in coupons]
+        page = (items, next_cursor, total)
+        public_coupon_cache.set(key, page)
+
+    items, next_cursor, total = page
+    set_page_headers(response, next_cursor, total)
+    response.headers["Cache-Control"] = "public, max-age=60"
+    set_surrogate_keys(response, "coupons")
+    return items
+
+# ✅ Protected: Admin-only, every coupon with optional filters
+@router.get("/admin", response_model=list[coupon_schema.CouponOut])
+def read_coupon_admin(
+    response: Response,
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    active: Optional[bool] = None,
+    redeemable: bool = False,
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin_user)  # 🔐
+):
+    coupons, next_cursor = crud.coupon.get_coupon(db, after_id=after, limit=limit, active=active, redeemable=redeemable)
+    total = crud.coupon.count_coupons(db, active=active, redeemable=redeemable) if after is None else None
+    set_page_headers(response, next_cursor, total)
+    return coupons
+
+# ✅ Protected: Admin-only, streamed NDJSON/CSV of every coupon
+@router.get("/admin/export")
+def export_coupons(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    active: Optional[bool] = None,
+    admin=Depends(get_current_admin_user)  # 🔐
+):
+    where = [models.Coupon.active == active] if active is not None else None
+    return stream_rows("coupons", fmt, where=where)
 
-# ✅ Public: Anyone can read coupons
-@router.get("/", response_model=list[coupon_schema.CouponOut])
-def read_coupon(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.coupon.get_coupon(db, skip=skip, limit=limit)
+# ✅ Logged-in users: preview a coupon against a cart subtotal (nothing is redeemed)
+@router.post("/validate", response_model=coupon_schema.CouponValidateOut)
+def validate_coupon(
+    data: coupon_schema.CouponValidateRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    try:
+        coupon = crud.coupon.get_valid_coupon(db, data.code, data.subtotal, user_id=user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "code": coupon.code,
+        "discount_type": coupon.discount_type,
+        "discount_value": coupon.discount_value,
+        "discount": crud.coupon.calculate_discount(coupon, data.subtotal),
+    }
 
 # ✅ Protected: Admin-only
 @router.put("/{coupon_id}", response_model=coupon_schema.CouponOut)
@@ -37,7 +112,10 @@ def update_coupon(
     if not db_coupon:
         raise HTTPException(status_code=404, detail="Coupon not found")
 
-    return crud.coupon.update_coupon(db, db_coupon=db_coupon, coupon_update=coupon_update)
+    db_coupon = crud.coupon.update_coupon(db, db_coupon=db_coupon, coupon_update=coupon_update)
+    crud.coupon.coupon_index.load(db)
+    purge("coupons")
+    return db_coupon
 
 # ✅ Protected: Admin-only
 @router.delete("/{coupon_id}", response_model=coupon_schema.CouponOut)
@@ -51,4 +129,6 @@ def delete_coupon(
         raise HTTPException(status_code=404, detail="Coupon not found")
 
     crud.coupon.delete_coupon(db, db_coupon=db_coupon)
+    crud.coupon.coupon_index.load(db)
+    purge("coupons")
     return db_coupon
@@ -0,0 +1,129 @@
+import json
+from datetime import timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, JSON
+
+from app.authentication import get_current_admin_user
+from app.streaming import EXPORT_COLUMNS, iter_row_batches
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for columnar exports
+    pa = None
+    pq = None
+
+router = APIRouter(prefix="/api/admin/export", tags=["Admin Export"])
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrows"}
+
+
+def _to_utc_naive(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _json_text(value):
+    return None if value is None else json.dumps(value)
+
+
+def _arrow_field(column):
+    """(arrow field, value converter or None) for a SQLAlchemy column."""
+    col_type = column.type
+    if isinstance(col_type, Boolean):
+        return pa.field(column.key, pa.bool_()), None
+    if isinstance(col_type, Integer):
+        return pa.field(column.key, pa.int64()), None
+    if isinstance(col_type, Float):
+        return pa.field(column.key, pa.float64()), None
+    if isinstance(col_type, DateTime):
+        return pa.field(column.key, pa.timestamp("us")), _to_utc_naive
+    if isinstance(col_type, Date):
+        return pa.field(column.key, pa.date32()), None
+    if isinstance(col_type, JSON):
+        return pa.field(column.key, pa.string()), _json_text
+    return pa.field(column.key, pa.string()), None
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the response generator."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _export_stream(columns, fmt: str):
+    fields, converters = zip(*(_arrow_field(c) for c in columns))
+    schema = pa.schema(fields)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in iter_row_batches(columns):
+            arrays = []
+            for i, (field, convert) in enumerate(zip(fields, converters)):
+                values = [row[i] for row in rows]
+                if convert is not None:
+                    values = [convert(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            # for Parquet every batch becomes its own row group
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/{table}")
+def export_table(
+    table: str,
+    fmt: str = Query("parquet", alias="format", pattern="^(parquet|arrow)$"),
+    admin=Depends(get_current_admin_user),
+):
+    """
+    Streams a whole table as Parquet or an Arrow IPC stream.
+
+    Rows are read in bounded chunks through server-side cursors, one short
+    read transaction per window, from READ_DATABASE_URL when configured.
+    """
+    if pa is None:
+        raise HTTPException(status_code=501, detail="Columnar export requires the 'pyarrow' package")
+    columns = EXPORT_COLUMNS.get(table)
+    if columns is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export table '{table}'")
+
+    return StreamingResponse(
+        _export_stream(columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{EXTENSIONS[fmt]}"'},
+    )
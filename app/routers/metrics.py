@@ -0,0 +1,23 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    """Open unless METRICS_TOKEN is set; then scrapers send it as a bearer token."""
+    if not metrics.METRICS_TOKEN:
+        return
+    expected = f"Bearer {metrics.METRICS_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(_: None = Depends(verify_metrics_token)):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
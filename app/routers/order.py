@@ -1,40 +1,291 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import hmac
+import json
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import crud
-from app.models.order import Order, OrderTracking
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db, SessionLocal
+from app.http_cache import purge
+from app import crud, events
+from app.authentication import get_current_user, get_current_admin_user, get_user_from_token
+from app.models import User
+from app.models.order import Order
 from app.schemas import order as order_schema
+from app.pagination import keyset_page, set_page_headers
+from app.serialization import orm_response
+from app.streaming import stream_rows
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+# -------------------- CHECKOUT --------------------
 @router.post("/", response_model=order_schema.OrderOut)
-def create_order(order: order_schema.OrderCreate, db: Session = Depends(get_db)):
-    return crud.order.create_order(db, order)
+@router.post("/checkout", response_model=order_schema.OrderOut)
+def create_order(
+    order: Optional[order_schema.OrderCreate] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    try:
+        db_order = crud.order.create_order(db, current_user.id, order)
+    except crud.order.CheckoutNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except crud.order.CheckoutConflict as e:
+        detail = {"message": str(e), "product_ids": e.product_ids} if e.product_ids is not None else str(e)
+        raise HTTPException(status_code=409, detail=detail)
+    except crud.order.CheckoutError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    purge(*(f"product:{item.product_id}" for item in db_order.items))
+    return db_order
+
+# -------------------- ORDER HISTORY --------------------
+@router.get("/me", response_model=List[order_schema.OrderHistoryOut], response_model_exclude_unset=True)
+def my_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    items: bool = False,
+    tracking: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The caller's orders, newest first. Pass X-Next-Cursor back as ?cursor=
+    for the next page; ?items=true / ?tracking=true embed line items and the
+    latest tracking update.
+    """
+    try:
+        orders, next_cursor = crud.order.get_order_history(
+            db, current_user.id, cursor, limit, with_items=items, with_tracking=tracking
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = orm_response(List[order_schema.OrderHistoryOut], orders, exclude_unset=True)
+    set_page_headers(response, next_cursor)
+    return response
+
+# -------------------- ADMIN LISTING --------------------
+def _order_filters(status: Optional[str], user_id: Optional[int]):
+    filters = []
+    if status:
+        filters.append(Order.status == status)
+    if user_id is not None:
+        filters.append(Order.user_id == user_id)
+    return filters
+
+@router.get("/admin", response_model=List[order_schema.OrderSummaryOut])
+def list_orders(
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin_user),
+):
+    query = db.query(Order).filter(*_order_filters(status, user_id))
+    orders, next_cursor = keyset_page(query, Order.id, after, limit)
+    response = orm_response(List[order_schema.OrderSummaryOut], orders)
+    set_page_headers(response, next_cursor)
+    return response
+
+@router.get("/admin/export")
+def export_orders(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    admin: User = Depends(get_current_admin_user),
+):
+    return stream_rows("orders", fmt, where=_order_filters(status, user_id))
+
+def verify_carrier_token(x_carrier_token: Optional[str] = Header(None)):
+    """Carrier webhooks authenticate with the shared secret in CARRIER_WEBHOOK_TOKEN."""
+    expected = os.getenv("CARRIER_WEBHOOK_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Carrier webhooks are not configured")
+    if not x_carrier_token or not hmac.compare_digest(x_carrier_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid carrier token")
+
+# declared before /{order_id}/tracking so "tracking" isn't taken for an order id
+@router.post("/tracking/batch", response_model=order_schema.TrackingBatchOut)
+def ingest_tracking_batch(
+    batch: order_schema.TrackingBatchIn,
+    db: Session = Depends(get_db),
+    _: None = Depends(verify_carrier_token),
+):
+    """Bulk carrier scan events; re-sent events (same event_id) are ignored."""
+    return crud.order.ingest_tracking_events(db, batch.events)
+
+def verify_tracking_writer(
+    authorization: Optional[str] = Header(None),
+    x_carrier_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Tracking updates reach customers' live feeds, so only carriers or admins may add them."""
+    if x_carrier_token is not None:
+        verify_carrier_token(x_carrier_token)
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    user = get_user_from_token(db, token) if scheme.lower() == "bearer" and token else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"})
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail=f"Admin access required (role={user.role})")
 
 @router.post("/{order_id}/tracking")
-def add_tracking(order_id: int, status: str, message: str, db: Session = Depends(get_db)):
+def add_tracking(
+    order_id: int,
+    status: str,
+    message: str,
+    db: Session = Depends(get_db),
+    _: None = Depends(verify_tracking_writer),
+):
     update = crud.order.add_tracking_update(db, order_id, status, message)
     return {"detail": "Tracking updated", "data": update.status}
 
-@router.get("/api/v1/product/{order_id}/tracking")
-def get_order_tracking(order_id: str, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if not db_order:
+def _viewable_order_id(
+    order_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> int:
+    # 404 rather than 403 so other customers' order ids aren't confirmed
+    if not crud.order.can_view_order(db, order_id, current_user):
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order_id
+
+@router.get("/{order_id}/tracking", response_model=order_schema.OrderTrackingOut)
+@router.get("/api/v1/product/{order_id}/tracking", response_model=order_schema.OrderTrackingOut, include_in_schema=False)
+def get_order_tracking(
+    request: Request,
+    response: Response,
+    order_id: int = Depends(_viewable_order_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Order status and tracking timeline, for the order's owner or an admin.
+    Send the returned ETag back as If-None-Match when polling; an unchanged
+    timeline answers 304 with no body.
+    """
+    timeline = crud.order.get_order_timeline(db, order_id)
+    if timeline is None:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    tracking_updates = db.query(OrderTracking).filter(OrderTracking.order_id == db_order.id).all()
-
-    tracking_data = {
-        "order": db_order,
-        "tracking": [
-            {
-                "id": update.id,
-                "status": update.status,
-                "message": update.message,
-                "timestamp": update.timestamp.isoformat(),
-            }
-            for update in tracking_updates
-        ],
-    }
-
-    return tracking_data
+    etag = crud.order.timeline_etag(timeline)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return timeline
+
+# -------------------- TRACKING PUSH (SSE / WebSocket) --------------------
+HEARTBEAT_SECONDS = 15
+
+def _load_timeline(order_id: int):
+    db = SessionLocal()
+    try:
+        return crud.order.get_order_timeline(db, order_id)
+    finally:
+        db.close()
+
+def _backlog(timeline: dict, last_event_id: Optional[int]):
+    return [
+        {**t, "timestamp": t["timestamp"].isoformat() if t["timestamp"] else None}
+        for t in timeline["tracking"]
+        if last_event_id is None or t["id"] > last_event_id
+    ]
+
+def _socket_user_can_view(token: Optional[str], order_id: int):
+    """None if the token is invalid, else whether its user may follow the order."""
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token) if token else None
+        if user is None:
+            return None
+        return crud.order.can_view_order(db, order_id, user)
+    finally:
+        db.close()
+
+async def _sse_stream(subscription, backlog):
+    with subscription:
+        last_id = 0
+        for event in backlog:
+            last_id = event["id"]
+            yield f"id: {event['id']}\nevent: tracking\ndata: {json.dumps(event)}\n\n"
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+            elif event["id"] > last_id:  # skip updates already sent from the backlog
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: tracking\ndata: {json.dumps(event)}\n\n"
+
+@router.get("/{order_id}/tracking/stream")
+async def stream_order_tracking(
+    order_id: int = Depends(_viewable_order_id),
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Server-sent events: the timeline so far (after Last-Event-ID when the
+    browser reconnects), then each new tracking update as it is written.
+    Only the order's owner or an admin may subscribe.
+    """
+    # subscribe before reading the timeline so nothing written in between is missed
+    subscription = events.hub.subscribe(crud.order.order_topic(order_id))
+    try:
+        timeline = await run_in_threadpool(_load_timeline, order_id)
+    except Exception:
+        subscription.close()
+        raise
+    if timeline is None:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    return StreamingResponse(
+        _sse_stream(subscription, _backlog(timeline, last_event_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/{order_id}/tracking/ws")
+async def order_tracking_socket(websocket: WebSocket, order_id: int, last_event_id: Optional[int] = None):
+    """
+    Same feed as the SSE stream, one JSON message per tracking update.
+    Browsers can't set headers on a WebSocket, so the bearer token may also
+    be passed as ?token=; the socket is closed with 4401 if it is invalid.
+    """
+    token = websocket.query_params.get("token")
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        token = credentials
+    allowed = await run_in_threadpool(_socket_user_can_view, token, order_id)
+    if allowed is None:
+        await websocket.close(code=4401)
+        return
+    if not allowed:
+        await websocket.close(code=4404)
+        return
+
+    with events.hub.subscribe(crud.order.order_topic(order_id)) as subscription:
+        timeline = await run_in_threadpool(_load_timeline, order_id)
+        if timeline is None:
+            await websocket.close(code=4404)
+            return
+        await websocket.accept()
+
+        async def send_updates():
+            last_id = 0
+            for event in _backlog(timeline, last_event_id):
+                last_id = event["id"]
+                await websocket.send_json(event)
+            async for event in subscription:
+                if event["id"] > last_id:
+                    last_id = event["id"]
+                    await websocket.send_json(event)
+
+        sender = asyncio.create_task(send_updates())
+        try:
+            # clients don't send anything; reading just notices the disconnect
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            sender.cancel()
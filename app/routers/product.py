@@ -1,19 +1,35 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request, Response
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from typing import List, Optional
-import os, json
+from typing import List, Optional, Union
+import os, json, uuid
 
-from app import schemas, models
+from app import crud, schemas, models
 from app.database import get_db
 from app.models import User
 from app.models.product import Product, ProductColor, ProductImage
-from app.schemas.product import ProductOut
+from app.schemas.product import (
+    ProductBulkUpdate, ProductBulkUpdateOut, ProductImportReport, ProductOut, ProductSummaryOut,
+)
 from app.authentication import get_current_admin_user
+from app.cache import TTLCache, bump_version, get_versions
+from app.compression import PrecompressedBody
+from app.http_cache import purge, set_surrogate_keys
+from app.crud import product_import
+from app.crud.product import PRODUCT_CACHE, product_cache
+from app.jobs import enqueue
+from app.schemas.job import JobQueuedOut
+from app.pagination import keyset_page, set_page_headers
+from app.serialization import dump_json, orm_response
+from app.streaming import stream_rows
 
 
 router = APIRouter()
 
+# product detail bodies, keyed by product data version so any product write invalidates them;
+# each entry keeps its gzip/br bytes next to the JSON so hot products are compressed once
+product_detail_cache = TTLCache(ttl=300, maxsize=2048)
+
 import re
 from fastapi import Request, UploadFile
 import shutil
@@ -77,16 +93,103 @@ def list_categories(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/product/{product_id}", response_model=ProductOut)
 def get_product(product_id: int, request: Request, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    for c in product.product_colors:
-        for img in c.images:
-            img.image_url = make_file_url(request, img.image_url)
-    return product
+    # image URLs are absolute, so the base URL is part of the key
+    key = (get_versions(db, (PRODUCT_CACHE, product_cache(product_id))), product_id, str(request.base_url))
+    body = product_detail_cache.get(key)
+    if body is None:
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        for c in product.product_colors:
+            for img in c.images:
+                img.image_url = make_file_url(request, img.image_url)
+        body = PrecompressedBody(dump_json(ProductOut, product))
+        product_detail_cache.set(key, body)
+    response = body.response(request.headers.get("accept-encoding", ""))
+    return set_surrogate_keys(response, f"product:{product_id}", "products")
 
 
 # ---------------------------- ADMIN ROUTES ----------------------------
+def _product_filters(category_id: Optional[int], subcategory_id: Optional[int], in_stock: Optional[bool]):
+    filters = []
+    if category_id is not None:
+        filters.append(Product.category_id == category_id)
+    if subcategory_id is not None:
+        filters.append(Product.subcategory_id == subcategory_id)
+    if in_stock is not None:
+        filters.append(Product.in_stock == in_stock)
+    return filters
+
+@router.get("/admin/list", response_model=List[ProductSummaryOut])
+def admin_list_products(
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    category_id: Optional[int] = None,
+    subcategory_id: Optional[int] = None,
+    in_stock: Optional[bool] = None,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    query = db.query(Product).filter(*_product_filters(category_id, subcategory_id, in_stock))
+    products, next_cursor = keyset_page(query, Product.id, after, limit)
+    response = orm_response(List[ProductSummaryOut], products)
+    set_page_headers(response, next_cursor)
+    return response
+
+@router.get("/admin/export")
+def admin_export_products(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    category_id: Optional[int] = None,
+    subcategory_id: Optional[int] = None,
+    in_stock: Optional[bool] = None,
+    current_user: User = Depends(get_current_admin_user),
+):
+    return stream_rows("products", fmt, where=_product_filters(category_id, subcategory_id, in_stock))
+
+@router.post("/import", response_model=Union[ProductImportReport, JobQueuedOut])
+def import_products(
+    response: Response,
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(product_import.BATCH_SIZE, ge=1, le=10000),
+    background: bool = False,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk-create products from a CSV or NDJSON upload (format defaults to the
+    file extension). See app/crud/product_import.py for the row layout; the
+    same pipeline is available offline as `python -m app.crud.product_import`.
+
+    With ?background=true the file is queued as a job and 202 is returned
+    with its id; poll GET /api/v1/jobs/{job_id} for progress and the report.
+    """
+    if fmt is None:
+        fmt = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    if background:
+        os.makedirs(product_import.IMPORT_DIR, exist_ok=True)
+        path = os.path.join(product_import.IMPORT_DIR, f"{uuid.uuid4().hex}.{fmt}")
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        job = enqueue(db, "product_import", {"path": path, "format": fmt, "batch_size": batch_size})
+        response.status_code = 202
+        return {"job_id": job.id, "status": job.status}
+    return product_import.import_products(db, product_import.iter_records(file.file, fmt), batch_size=batch_size)
+
+@router.patch("/bulk", response_model=ProductBulkUpdateOut)
+def bulk_update_products(
+    changes: ProductBulkUpdate,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """Partially update many products (e.g. a sale reprice) in one statement."""
+    try:
+        ids, skipped = crud.product.bulk_update_products(db, changes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    purge(*(f"product:{id_}" for id_ in ids))
+    return {"updated": len(ids), "ids": ids, "skipped": skipped}
+
 # helper: permissive list parser
 def parse_list_field(field):
     """
@@ -290,7 +393,9 @@ async def update_product(
             pi = ProductImage(color_id=target_color.id, image_url=filename)
             db.add(pi)
 
+    bump_version(db, PRODUCT_CACHE)
     db.commit()
+    purge(f"product:{product_id}")
     db.refresh(product)
 
     # convert image filenames to full URLs before returning (optional, router elsewhere may already do this)
@@ -318,7 +423,10 @@ def delete_image(
     except Exception:
         pass
 
+    product_id = db.query(ProductColor.product_id).filter(ProductColor.id == img.color_id).scalar()
     db.delete(img)
+    bump_version(db, PRODUCT_CACHE)
     db.commit()
+    purge(f"product:{product_id}")
 
     return {"message": f"Image {image_id} deleted successfully!"}
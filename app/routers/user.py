@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Optional
 from datetime import timedelta, datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
@@ -28,6 +28,8 @@ from app.schemas.user import (
     ForgotPasswordRequest,
 )
 from app.crud import user as crud
+from app.pagination import keyset_page, set_page_headers
+from app.streaming import stream_rows
 
 router = APIRouter()
 
@@ -89,12 +91,39 @@ def get_current_user_data(current_user: User = Depends(get_current_user)):
 
 
 # -------------------- GET ALL USERS (Admin only) --------------------
+def _user_filters(role: Optional[str], email: Optional[str]):
+    filters = []
+    if role:
+        filters.append(User.role == role)
+    if email:
+        filters.append(User.email.startswith(email, autoescape=True))  # prefix match uses the email index
+    return filters
+
+
 @router.get("/users", response_model=List[UserOut])
 def get_all_users(
+    response: Response,
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    role: Optional[str] = None,
+    email: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user),
 ):
-    return db.query(User).all()
+    query = db.query(User).filter(*_user_filters(role, email))
+    users, next_cursor = keyset_page(query, User.id, after, limit)
+    set_page_headers(response, next_cursor)
+    return users
+
+
+@router.get("/users/export")
+def export_users(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    role: Optional[str] = None,
+    email: Optional[str] = None,
+    current_user: User = Depends(get_current_admin_user),
+):
+    return stream_rows("users", fmt, where=_user_filters(role, email))
 
 
 # -------------------- CHANGE PASSWORD --------------------
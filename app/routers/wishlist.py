@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app import crud, schemas, models
 from app.authentication import get_db, get_current_user
-from app.schemas.wishlist import WishlistCreate, WishlistItemOut
+from app.routers.product import make_file_url
+from app.crud.membership import get_membership
+from app.schemas.wishlist import MembershipOut, MembershipRequest, WishlistCreate, WishlistItemOut, WishlistProductOut
 
 router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
 
@@ -10,9 +12,30 @@ router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
 def get_wishlist(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     return crud.wishlist.get_user_wishlist(db, current_user.id)
 
+@router.get("/products", response_model=list[WishlistProductOut])
+def get_wishlist_products(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Wishlist with the product details a wishlist page renders, newest first."""
+    items = crud.wishlist.get_user_wishlist_products(db, current_user.id)
+    for item in items:
+        if item["thumbnail"]:
+            item["thumbnail"] = make_file_url(request, item["thumbnail"])
+    return items
+
+@router.post("/membership", response_model=list[MembershipOut])
+def check_membership(body: MembershipRequest, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Wishlist/cart flags for a page of product cards, e.g. to draw heart icons."""
+    wishlist, cart = get_membership(db, current_user.id)
+    return [
+        {"product_id": pid, "in_wishlist": pid in wishlist, "in_cart": pid in cart}
+        for pid in body.product_ids
+    ]
+
 @router.post("/", response_model=schemas.WishlistItemOut)
 def add_wishlist_item(wishlist: schemas.WishlistCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.wishlist.add_to_wishlist(db, current_user.id, wishlist)
+    try:
+        return crud.wishlist.add_to_wishlist(db, current_user.id, wishlist)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/{product_id}")
 def delete_wishlist_item(product_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
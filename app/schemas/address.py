@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class AddressBase(BaseModel):
@@ -11,13 +11,22 @@ class AddressBase(BaseModel):
     country: str
     phone: str
     default: Optional[bool] = False
-    user_id: int
 
 class AddressCreate(AddressBase):
-    pass  # same as AddressBase for now
+    pass  # the owner is always the authenticated user
+
+class AddressUpdate(BaseModel):
+    name: Optional[str] = None
+    line1: Optional[str] = None
+    line2: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    postal_code: Optional[str] = None
+    country: Optional[str] = None
+    phone: Optional[str] = None
 
 class AddressOut(AddressBase):
     id: int
+    user_id: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
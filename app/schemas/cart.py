@@ -1,6 +1,6 @@
 # app/schemas/cart.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class CartItemCreate(BaseModel):
@@ -15,5 +15,4 @@ class CartItemOut(BaseModel):
     product_id: int
     quantity: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
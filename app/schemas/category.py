@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class SubcategoryOut(BaseModel):
     id: int
@@ -8,8 +8,7 @@ class SubcategoryOut(BaseModel):
     category_id: Optional[int]  # <-- allow None
     subcategory_id: Optional[int]  # <-- allow None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class SubCategoryCreate(BaseModel):
     name: str
@@ -38,5 +37,4 @@ class CategoryOut(BaseModel):
     # avoid mutable default; allow None when there are no subcategories
     subcategories: Optional[List[SubcategoryOut]] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
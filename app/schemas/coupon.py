@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from typing import Optional
 
@@ -11,6 +11,7 @@ class CouponBase(BaseModel):
     valid_from: datetime
     valid_to: datetime
     max_uses: Optional[int] = None
+    max_uses_per_user: Optional[int] = None
     active: bool = True
 
 class CouponCreate(CouponBase):
@@ -26,10 +27,32 @@ class CouponUpdate(BaseModel):
     valid_from: Optional[datetime] = None
     valid_to: Optional[datetime] = None
     max_uses: Optional[int] = None
+    max_uses_per_user: Optional[int] = None
     active: Optional[bool] = None
 class CouponOut(CouponBase):
     id: int
     used_count: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class CouponPublicOut(BaseModel):
+    id: int
+    code: str
+    description: Optional[str] = None
+    discount_type: str
+    discount_value: float
+    minimum_purchase: Optional[float] = 0.0
+    valid_from: datetime
+    valid_to: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CouponValidateRequest(BaseModel):
+    code: str
+    subtotal: float
+
+class CouponValidateOut(BaseModel):
+    code: str
+    discount_type: str
+    discount_value: float
+    discount: float
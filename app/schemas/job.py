@@ -0,0 +1,23 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Optional
+from datetime import datetime
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    run_after: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class JobQueuedOut(BaseModel):
+    job_id: int
+    status: str
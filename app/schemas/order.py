@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
 from typing import List, Optional
 
@@ -7,20 +7,100 @@ class TrackingUpdate(BaseModel):
     message: str
     timestamp: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class TrackingEventOut(BaseModel):
+    id: int
+    status: Optional[str] = None
+    message: Optional[str] = None
+    timestamp: datetime
+
+class OrderTrackingOut(BaseModel):
+    order_id: int
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    tracking: List[TrackingEventOut] = []
+
+class TrackingEventIn(BaseModel):
+    event_id: str = Field(..., min_length=1, max_length=100)  # carrier's unique scan id
+    order_id: int
+    status: str = Field(..., max_length=50)
+    message: Optional[str] = None
+    timestamp: Optional[datetime] = None  # defaults to the time of receipt
+
+class TrackingBatchIn(BaseModel):
+    events: List[TrackingEventIn] = Field(..., max_length=10000)
+
+class TrackingBatchOut(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    unknown_orders: List[int] = []
+
+class OrderItemOut(BaseModel):
+    product_id: Optional[int] = None
+    product_name: str
+    unit_price: float
+    quantity: int
+    line_total: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ShippingAddressOut(BaseModel):
+    # snapshot taken at checkout
+    name: Optional[str] = None
+    line1: Optional[str] = None
+    line2: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    postal_code: Optional[str] = None
+    country: Optional[str] = None
+    phone: Optional[str] = None
 
 class OrderBase(BaseModel):
     user_id: int
 
-class OrderCreate(OrderBase):
-    pass
+class OrderCreate(BaseModel):
+    # The order is built from the caller's cart; only the coupon and the
+    # shipping address (defaults to the user's default address) are client-supplied
+    coupon_code: Optional[str] = None
+    address_id: Optional[int] = None
+
+class OrderSummaryOut(OrderBase):
+    id: int
+    status: str
+    created_at: datetime
+    subtotal: Optional[float] = 0.0
+    discount: Optional[float] = 0.0
+    total: Optional[float] = 0.0
+    coupon_code: Optional[str] = None
+    address_id: Optional[int] = None
+    shipping_address: Optional[ShippingAddressOut] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OrderHistoryOut(BaseModel):
+    id: int
+    status: Optional[str] = None
+    created_at: datetime
+    subtotal: Optional[float] = 0.0
+    discount: Optional[float] = 0.0
+    total: Optional[float] = 0.0
+    coupon_code: Optional[str] = None
+    items: Optional[List[OrderItemOut]] = None  # only with ?items=true
+    latest_tracking: Optional[TrackingEventOut] = None  # only with ?tracking=true
 
 class OrderOut(OrderBase):
     id: int
     status: str
     created_at: datetime
+    subtotal: Optional[float] = 0.0
+    discount: Optional[float] = 0.0
+    total: Optional[float] = 0.0
+    coupon_code: Optional[str] = None
+    address_id: Optional[int] = None
+    shipping_address: Optional[ShippingAddressOut] = None
+    items: List[OrderItemOut] = []
     tracking_updates: List[TrackingUpdate] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
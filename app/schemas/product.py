@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -6,19 +6,18 @@ class ProductImageOut(BaseModel):
     id: int
     image_url: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ProductColorOut(BaseModel):
     id: int
     color_name: str
     images: Optional[List[ProductImageOut]] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-class ProductOut(BaseModel):
+class ProductSummaryOut(BaseModel):
     id: int
+    sku: Optional[str] = None
     name: str
     description: Optional[str] = None
     price: float
@@ -27,6 +26,7 @@ class ProductOut(BaseModel):
     subcategory_id: Optional[int] = None      # <- make optional
     sizes: Optional[List[str]] = None
     in_stock: Optional[bool] = True
+    stock: Optional[int] = None
     rating: Optional[float] = 0.0
     reviews: Optional[int] = 0
     featured: Optional[bool] = False
@@ -37,7 +37,82 @@ class ProductOut(BaseModel):
     details: Optional[str] = None
     created_at: Optional[datetime] = None
 
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductOut(ProductSummaryOut):
     product_colors: Optional[List[ProductColorOut]] = None
 
-    class Config:
-        orm_mode = True
+class ProductImportColor(BaseModel):
+    name: str
+    images: List[str] = []
+
+class ProductImportRow(BaseModel):
+    sku: str
+    name: str
+    description: Optional[str] = None
+    price: float
+    discount_price: float = 0.0
+    category: str      # category slug
+    subcategory: str   # subcategory slug
+    sizes: List[str] = []
+    colors: List[ProductImportColor] = []
+    in_stock: bool = True
+    stock: Optional[int] = None
+    featured: bool = False
+    best_seller: bool = False
+    new_arrival: bool = False
+    highlights: Optional[str] = None
+    specifications: Optional[str] = None
+    details: Optional[str] = None
+
+    @field_validator("colors")
+    @classmethod
+    def unique_color_names(cls, colors):
+        # images are attached by color name, so a product can't list the same color twice
+        seen = set()
+        for color in colors:
+            name = color.name.strip().lower()
+            if name in seen:
+                raise ValueError(f"duplicate color '{color.name}'")
+            seen.add(name)
+        return colors
+
+class ProductImportError(BaseModel):
+    row: int
+    sku: Optional[str] = None
+    error: str
+
+class ProductImportReport(BaseModel):
+    processed: int
+    inserted: int
+    failed: int
+    errors: List[ProductImportError] = []
+    elapsed_seconds: float
+    rows_per_second: float
+
+class ProductBulkUpdate(BaseModel):
+    # which products: explicit ids and/or a category/subcategory filter
+    ids: Optional[List[int]] = None
+    category_id: Optional[int] = None
+    subcategory_id: Optional[int] = None
+
+    # what to change; fields left out are not touched
+    price: Optional[float] = Field(None, gt=0)
+    discount_price: Optional[float] = Field(None, ge=0)
+    discount_percent: Optional[float] = Field(None, gt=0, lt=100)  # sale price = price * (1 - pct / 100)
+    in_stock: Optional[bool] = None
+    featured: Optional[bool] = None
+    best_seller: Optional[bool] = None
+    new_arrival: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def discount_below_price(self):
+        if self.price is not None and self.discount_price is not None and self.discount_price >= self.price:
+            raise ValueError("discount_price must be below price")
+        return self
+
+class ProductBulkUpdateOut(BaseModel):
+    updated: int
+    ids: List[int] = []
+    # matched, but left unchanged because the sale price wouldn't be below the price
+    skipped: List[int] = []
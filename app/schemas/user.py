@@ -1,6 +1,6 @@
 from typing import Optional, List
 from uuid import uuid4
-from pydantic import BaseModel, Field, EmailStr, constr
+from pydantic import BaseModel, Field, EmailStr, constr, ConfigDict
 from datetime import datetime
 
 users = []
@@ -30,12 +30,7 @@ class UserOut(BaseModel):
     avatar: Optional[str] = None           # ✅ Now allows null
     created_at: Optional[datetime] = None  # ✅ Now allows null
 
-    class Config:
-        from_attributes = True
-
-
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Address(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid4()))
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
 
 class WishlistBase(BaseModel):
     product_id: int
@@ -12,3 +13,20 @@ class WishlistItemOut(BaseModel):
 
     # ✅ New Pydantic v2 syntax (replaces class Config)
     model_config = ConfigDict(from_attributes=True)
+
+class WishlistProductOut(BaseModel):
+    id: int
+    product_id: int
+    name: str
+    price: float
+    discount_price: Optional[float] = None
+    in_stock: Optional[bool] = True
+    thumbnail: Optional[str] = None  # first image of the first color
+
+class MembershipRequest(BaseModel):
+    product_ids: List[int] = Field(..., max_length=500)
+
+class MembershipOut(BaseModel):
+    product_id: int
+    in_wishlist: bool
+    in_cart: bool
@@ -0,0 +1,42 @@
+"""
+Fast JSON responses for ORM objects.
+
+When a route returns ORM objects, FastAPI validates them against
+`response_model`, converts the result to plain Python data with
+jsonable_encoder and only then encodes it. For output we build ourselves
+that is redundant: orm_response() validates straight from attributes with
+a TypeAdapter compiled once per type, and pydantic-core writes the JSON
+bytes in the same pass. Routes keep `response_model=` for the OpenAPI
+schema and return orm_response(...) instead of the objects.
+
+Everything else goes out through ORJSONResponse, the app's default
+response class.
+"""
+from functools import lru_cache
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+
+def dump_json(tp, obj, **dump_options) -> bytes:
+    """Validate `obj` (ORM objects, dicts or a list of them) as `tp` and encode it."""
+    adapter = type_adapter(tp)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True), **dump_options)
+
+
+def orm_response(tp, obj, status_code: int = 200, headers: dict = None, **dump_options) -> Response:
+    """
+    JSON response for `obj` shaped by `tp`, e.g. orm_response(List[ProductOut], products).
+    `dump_options` are passed to TypeAdapter.dump_json (exclude_none, exclude_unset, ...).
+    """
+    return Response(
+        content=dump_json(tp, obj, **dump_options),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import JSON, select
+
+from app.database import ReadSessionLocal
+from app.models import Coupon, Order, OrderTracking, User
+from app.models.product import Product
+
+# Rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 5000
+# Rows read per transaction; each window is its own short read so a long
+# export never pins one snapshot/transaction on the database
+WINDOW_SIZE = 50000
+
+
+def iter_row_batches(columns, where=None, batch_size: int = BATCH_SIZE, window_size: int = WINDOW_SIZE):
+    """
+    Yield lists of rows for `columns` in primary-key order.
+
+    `columns[0]` must be the table's integer primary key; it is used for
+    keyset windows. Rows are streamed with yield_per from the read replica
+    (or the primary when none is configured), so memory stays bounded by
+    `batch_size` no matter how big the table is.
+    """
+    pk = columns[0]
+    last_id = None
+    while True:
+        stmt = select(*columns).order_by(pk).limit(window_size)
+        if where is not None:
+            stmt = stmt.where(*where) if isinstance(where, (list, tuple)) else stmt.where(where)
+        if last_id is not None:
+            stmt = stmt.where(pk > last_id)
+
+        fetched = 0
+        db = ReadSessionLocal()
+        try:
+            result = db.execute(stmt.execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                fetched += len(partition)
+                last_id = partition[-1][0]
+                yield partition
+        finally:
+            db.close()
+
+        if fetched < window_size:
+            return
+
+
+# Columns available to admin exports/streams. Explicit lists so secrets such
+# as password hashes never leave the database.
+EXPORT_COLUMNS = {
+    "orders": [
+        Order.id, Order.user_id, Order.status, Order.created_at,
+        Order.subtotal, Order.discount, Order.total, Order.coupon_code, Order.address_id,
+        Order.shipping_address,
+    ],
+    "order_tracking": [
+        OrderTracking.id, OrderTracking.order_id, OrderTracking.status,
+        OrderTracking.message, OrderTracking.timestamp,
+    ],
+    "products": [
+        Product.id, Product.sku, Product.name, Product.description, Product.price, Product.discount_price,
+        Product.category_id, Product.subcategory_id, Product.sizes, Product.in_stock, Product.stock,
+        Product.rating, Product.reviews, Product.featured, Product.best_seller, Product.new_arrival,
+        Product.created_at,
+    ],
+    "users": [
+        User.id, User.first_name, User.last_name, User.email, User.role, User.phone,
+        User.city, User.region, User.postal_code, User.country, User.created_at,
+    ],
+    "coupons": [
+        Coupon.id, Coupon.code, Coupon.description, Coupon.discount_type, Coupon.discount_value,
+        Coupon.minimum_purchase, Coupon.valid_from, Coupon.valid_to, Coupon.max_uses,
+        Coupon.max_uses_per_user, Coupon.used_count, Coupon.active,
+    ],
+}
+
+TEXT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_lines(columns, where):
+    keys = [c.key for c in columns]
+    for rows in iter_row_batches(columns, where=where):
+        yield "".join(
+            json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in rows
+        ).encode()
+
+
+def _csv_value(value, is_json: bool):
+    if value is None:
+        return ""
+    if is_json:
+        return json.dumps(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(columns, where):
+    json_flags = [isinstance(c.type, JSON) for c in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c.key for c in columns])
+    for rows in iter_row_batches(columns, where=where):
+        writer.writerows([_csv_value(v, j) for v, j in zip(row, json_flags)] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_rows(name: str, fmt: str, where=None) -> StreamingResponse:
+    """NDJSON or CSV response for EXPORT_COLUMNS[name], written batch by batch."""
+    columns = EXPORT_COLUMNS[name]
+    body = _ndjson_lines(columns, where) if fmt == "ndjson" else _csv_lines(columns, where)
+    return StreamingResponse(
+        body,
+        media_type=TEXT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
@@ -0,0 +1,104 @@
+"""
+Serialization micro-benchmark: FastAPI's default response path vs the
+TypeAdapter/orjson path in app/serialization.py, per endpoint shape.
+
+    python benchmarks/bench_serialization.py [--repeat 200]
+
+"before" is what FastAPI does with a `response_model`: validate the ORM
+objects, turn the result into jsonable data and encode it with json.dumps.
+"after" is orm_response(): one TypeAdapter validation from attributes and
+a pydantic-core JSON dump. Objects are transient ORM instances, so no
+database is needed.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Order, OrderItem
+from app.models.product import Product, ProductColor, ProductImage
+from app.schemas.order import OrderOut, OrderSummaryOut
+from app.schemas.product import ProductOut, ProductSummaryOut
+from app.serialization import dump_json
+
+
+def make_product(i: int) -> Product:
+    product = Product(
+        id=i, sku=f"SKU-{i}", name=f"Product {i}", description="Soft cotton tee " * 10,
+        price=499.0, discount_price=399.0, category_id=1, subcategory_id=2,
+        sizes=["S", "M", "L", "XL"], in_stock=True, stock=20, rating=4.2, reviews=31,
+        featured=False, best_seller=True, new_arrival=False, highlights="100% cotton",
+        specifications="Regular fit", details="Machine wash", created_at=datetime(2026, 1, 1),
+    )
+    for c in range(3):
+        color = ProductColor(id=i * 10 + c, color_name=f"Color {c}")
+        color.images = [ProductImage(id=i * 100 + c * 10 + k, image_url=f"img_{i}_{c}_{k}.jpg") for k in range(4)]
+        product.product_colors.append(color)
+    return product
+
+
+def make_order(i: int) -> Order:
+    order = Order(
+        id=i, user_id=7, status="shipped", created_at=datetime(2026, 1, 1),
+        subtotal=1200.0, discount=100.0, total=1100.0, coupon_code=None,
+    )
+    order.items = [
+        OrderItem(product_id=k, product_name=f"Product {k}", unit_price=300.0, quantity=1, line_total=300.0)
+        for k in range(4)
+    ]
+    return order
+
+
+def before(schema, objs, many: bool) -> bytes:
+    if many:
+        data = [schema.model_validate(o) for o in objs]
+    else:
+        data = schema.model_validate(objs)
+    return json.dumps(jsonable_encoder(data)).encode()
+
+
+def before_orjson(schema, objs, many: bool) -> bytes:
+    # FastAPI with ORJSONResponse as the default class but still a response_model
+    if many:
+        data = [schema.model_validate(o) for o in objs]
+    else:
+        data = schema.model_validate(objs)
+    return orjson.dumps(jsonable_encoder(data))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    products = [make_product(i) for i in range(100)]
+    orders = [make_order(i) for i in range(100)]
+    cases = [
+        ("GET /api/v1/product/product/{id}", ProductOut, ProductOut, products[0], False),
+        ("GET /api/v1/product/admin/list (100)", ProductSummaryOut, List[ProductSummaryOut], products, True),
+        ("GET /api/orders/orders/admin (100)", OrderSummaryOut, List[OrderSummaryOut], orders, True),
+        ("order detail (OrderOut)", OrderOut, OrderOut, orders[0], False),
+    ]
+
+    print(f"{'endpoint':40} {'json.dumps':>12} {'orjson':>12} {'adapter':>12} {'speedup':>8}")
+    for name, schema, tp, objs, many in cases:
+        assert json.loads(before(schema, objs, many)) == json.loads(dump_json(tp, objs))
+        t_before = min(timeit.repeat(lambda: before(schema, objs, many), number=args.repeat, repeat=3)) / args.repeat
+        t_orjson = min(timeit.repeat(lambda: before_orjson(schema, objs, many), number=args.repeat, repeat=3)) / args.repeat
+        t_after = min(timeit.repeat(lambda: dump_json(tp, objs), number=args.repeat, repeat=3)) / args.repeat
+        print(
+            f"{name:40} {t_before * 1e6:10.1f}us {t_orjson * 1e6:10.1f}us {t_after * 1e6:10.1f}us "
+            f"{t_before / t_after:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional, List
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -9,14 +10,22 @@ from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
 import os
 
+from app.compression import CompressionMiddleware
+from app.cpu_profiler import ProfileRequestMiddleware
 from app.crud.user import get_password_hash
-from app.database import init_db, engine, Base, SessionLocal
+from app.database import init_db, engine, read_engine, Base, SessionLocal
+from app.http_cache import HTTPCacheMiddleware, set_surrogate_keys
+from app.idempotency import IdempotencyMiddleware
+from app.jobs import JOB_WORKERS, JobWorker, run_workers
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.profiling import SQL_PROFILE, SQLProfileMiddleware, profile_engine
 from app.routers import (
     address,
     coupon as coupon_router,
     category as category_router,
     product as product_router,
-    order, cart, wishlist,
+    order, cart, wishlist, analytics, jobs, metrics,
+    export as export_router,
 )
 
 from app.routers.admin import router as admin_router
@@ -46,8 +55,24 @@ async def lifespan(app: FastAPI):
         print("✅ Admin user created.")
     else:
         print("ℹ️ Admin user already exists.")
+
+    # Warm in-memory lookups
+    from app.crud.coupon import coupon_index
+    coupon_index.load(db)
     db.close()
+
+    # Cross-process push for SSE/WebSocket subscribers (EVENT_BROKER_URL)
+    from app.events import start_broker, stop_broker
+    start_broker()
+
+    # Background jobs; set JOB_WORKERS=0 when running `python run.py worker` separately
+    worker = JobWorker(JOB_WORKERS) if JOB_WORKERS > 0 else None
+    if worker:
+        worker.start()
     yield
+    if worker:
+        worker.stop()
+    stop_broker()
 
 # Create FastAPI app
 app = FastAPI(
@@ -55,6 +80,7 @@ app = FastAPI(
     description="API for Templamart where users can buy and sell templates.",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 os.makedirs("static/products", exist_ok=True)
@@ -70,15 +96,32 @@ app.mount(
 
 
 # Middleware
+app.add_middleware(IdempotencyMiddleware)
 SECRET_KEY = os.urandom(24).hex()
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
+# outside idempotency, so replayed responses are compressed too
+app.add_middleware(CompressionMiddleware)
+# outside compression, so cached entries hold the encoded bytes
+app.add_middleware(HTTPCacheMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
+# X-Profile: <PROFILE_TOKEN> returns a sampled profile of the request; outside the cache so reports aren't cached
+app.add_middleware(ProfileRequestMiddleware)
+# outside the response cache, so cached entries never keep a stale Server-Timing header
+if SQL_PROFILE:
+    app.add_middleware(SQLProfileMiddleware)
+    profile_engine(engine)
+    profile_engine(read_engine)
+# outermost, so latency includes every other middleware (and cache hits)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(read_engine, "read")
 
 # Routers
 app.include_router(user_router, prefix="/api/v1/users", tags=["Users"])
@@ -91,6 +134,10 @@ app.include_router(admin_router, prefix="/api/v1/admin", tags=["Admin"])
 app.include_router(order.router, prefix="/api/orders", tags=["Orders"])
 app.include_router(cart.router)
 app.include_router(wishlist.router)
+app.include_router(analytics.router)
+app.include_router(export_router.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 # Example Schemas and Mock Data...
 # (Place your schemas and mock data here as before)
 
@@ -567,7 +614,8 @@ async def get_users():
     return users
 
 @app.get("/api/categories", response_model=List[Category])
-async def get_categories():
+async def get_categories(response: Response):
+    set_surrogate_keys(response, "categories")
     return categories_data
 
 @app.get("/api/coupons", response_model=List[Coupon])
@@ -579,4 +627,8 @@ async def get_coupons():
 
 
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["worker"]:
+        run_workers()
+        sys.exit(0)
     uvicorn.run("run:app", host="127.0.0.1", port=8000, reload=True,  log_level="debug")
@@ -0,0 +1,86 @@
+"""
+Tests run the real app (run.py, with its whole middleware stack) against a
+throwaway SQLite database. Tables are emptied and the in-process caches
+cleared after every test.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="jokroup-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["JOB_WORKERS"] = "0"  # tests drive jobs directly
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run
+from app.authentication import create_access_token
+from app.crud.coupon import coupon_index
+from app.crud.membership import membership_cache
+from app.database import Base, SessionLocal, engine
+from app.http_cache import response_cache, version_cache
+from app.models import Category, SubCategory, User
+from app.models.product import Product
+from app.routers.category import category_tree_cache
+from app.routers.coupon import public_coupon_cache
+from app.routers.product import product_detail_cache
+
+_CACHES = (response_cache, version_cache, product_detail_cache, public_coupon_cache, category_tree_cache, membership_cache)
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as c:
+        yield c
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    for cache in _CACHES:
+        cache.clear()
+    coupon_index._version = None
+
+
+def auth(user: User) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": user.email, "role": user.role})}
+
+
+@pytest.fixture
+def make_user(db):
+    def make(email="user@example.com", role="user"):
+        user = User(first_name="Test", last_name="User", email=email, password="x", role=role)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_product(db):
+    def make(**fields):
+        category = db.query(Category).first()
+        if category is None:
+            category = Category(name="Men", slug="men")
+            db.add(category)
+            db.flush()
+            db.add(SubCategory(name="Shirts", slug="shirts", category_id=category.id))
+            db.flush()
+        subcategory = db.query(SubCategory).first()
+        fields.setdefault("name", "Tee")
+        fields.setdefault("price", 10.0)
+        product = Product(category_id=category.id, subcategory_id=subcategory.id, **fields)
+        db.add(product)
+        db.commit()
+        return product
+    return make
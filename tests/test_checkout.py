@@ -0,0 +1,68 @@
+from app.models import CartItem, Order, OrderItem
+from app.models.product import Product
+
+from tests.conftest import auth
+
+
+def _checkout(client, user, body=None):
+    return client.post("/api/orders/orders/checkout", json=body, headers=auth(user))
+
+
+def _add(db, user, product, quantity):
+    db.add(CartItem(user_id=user.id, product_id=product.id, quantity=quantity))
+    db.commit()
+
+
+def test_checkout_reserves_stock_and_snapshots_lines(client, db, make_user, make_product):
+    user = make_user()
+    tee = make_product(price=10, stock=5)
+    cap = make_product(name="Cap", price=4.5, stock=None)  # untracked stock
+    _add(db, user, tee, 2)
+    _add(db, user, cap, 3)
+
+    response = _checkout(client, user)
+    assert response.status_code == 200
+    order = response.json()
+    assert order["subtotal"] == order["total"] == 33.5
+    assert sorted((i["product_name"], i["quantity"], i["line_total"]) for i in order["items"]) == [
+        ("Cap", 3, 13.5), ("Tee", 2, 20.0),
+    ]
+    db.expire_all()
+    assert db.get(Product, tee.id).stock == 3
+    assert db.get(Product, cap.id).stock is None
+    assert db.query(CartItem).count() == 0
+
+
+def test_insufficient_stock_changes_nothing(client, db, make_user, make_product):
+    user = make_user()
+    plenty = make_product(stock=10)
+    scarce = make_product(name="Scarce", stock=1)
+    _add(db, user, plenty, 2)
+    _add(db, user, scarce, 2)
+
+    response = _checkout(client, user)
+    assert response.status_code == 409
+    assert response.json()["detail"]["product_ids"] == [scarce.id]
+    db.expire_all()
+    # the conditional UPDATE touched no row, and nothing else was written
+    assert (db.get(Product, plenty.id).stock, db.get(Product, scarce.id).stock) == (10, 1)
+    assert db.query(Order).count() == db.query(OrderItem).count() == 0
+    assert db.query(CartItem).count() == 2
+
+
+def test_last_unit_is_sold_once(client, db, make_user, make_product):
+    product = make_product(stock=1)
+    first, second = make_user("a@example.com"), make_user("b@example.com")
+    _add(db, first, product, 1)
+    _add(db, second, product, 1)
+    assert _checkout(client, first).status_code == 200
+    assert _checkout(client, second).status_code == 409
+    db.expire_all()
+    assert db.get(Product, product.id).stock == 0
+
+
+def test_empty_cart_and_unknown_address(client, db, make_user, make_product):
+    user = make_user()
+    assert _checkout(client, user).status_code == 400
+    _add(db, user, make_product(), 1)
+    assert _checkout(client, user, {"address_id": 999}).status_code == 404
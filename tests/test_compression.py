@@ -0,0 +1,40 @@
+import gzip
+
+
+def test_short_json_is_not_compressed(client):
+    response = client.get("/api/v1/coupon/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_short_error_is_not_compressed(client):
+    response = client.get("/api/v1/product/product/999", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 404
+    assert "content-encoding" not in response.headers
+
+
+def test_large_json_is_compressed(client):
+    response = client.get("/api/users", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()
+
+
+def test_precompressed_body_is_not_compressed_again(client, make_product):
+    product = make_product()
+    response = client.get(f"/api/v1/product/product/{product.id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers  # below the threshold
+    assert response.json()["id"] == product.id
+
+
+def test_large_precompressed_body_is_encoded_once(client, make_product):
+    product = make_product(description="x" * 4000)
+    response = client.get(
+        f"/api/v1/product/product/{product.id}", headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx decodes one layer; a second layer would leave gzip bytes behind
+    assert response.json()["id"] == product.id
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud import coupon as coupon_crud
+from app.models import CartItem, Coupon, CouponRedemption
+from app.models.product import Product
+
+from tests.conftest import auth
+
+
+@pytest.fixture
+def make_coupon(db):
+    def make(**fields):
+        fields.setdefault("code", "SAVE10")
+        coupon = Coupon(
+            discount_type="fixed", discount_value=1, valid_to=datetime.utcnow() + timedelta(days=1), **fields,
+        )
+        db.add(coupon)
+        db.commit()
+        coupon_crud.coupon_index.load(db)  # as the admin create route does
+        return coupon
+    return make
+
+
+def _checkout(client, db, user, product, code="SAVE10"):
+    db.add(CartItem(user_id=user.id, product_id=product.id, quantity=1))
+    db.commit()
+    return client.post("/api/orders/orders/checkout", json={"coupon_code": code}, headers=auth(user))
+
+
+def test_global_limit_is_not_oversold(client, db, make_user, make_product, make_coupon):
+    coupon = make_coupon(max_uses=1)
+    product = make_product(stock=10)
+    first, second = make_user("a@example.com"), make_user("b@example.com")
+    assert _checkout(client, db, first, product).status_code == 200
+    assert _checkout(client, db, second, product).status_code in (400, 409)
+    db.expire_all()
+    assert db.get(Coupon, coupon.id).used_count == 1
+    # the failed checkout rolled back its stock reservation
+    assert db.get(Product, product.id).stock == 9
+
+
+def test_per_user_limit(client, db, make_user, make_product, make_coupon):
+    make_coupon(max_uses_per_user=2)
+    product = make_product()
+    user = make_user()
+    assert _checkout(client, db, user, product).status_code == 200
+    assert _checkout(client, db, user, product).status_code == 200
+    assert _checkout(client, db, user, product).status_code in (400, 409)
+    assert sorted(n for (n,) in db.query(CouponRedemption.use_number)) == [1, 2]
+
+
+def test_lost_slot_is_a_conflict_and_keeps_the_transaction_usable(db, make_user, make_coupon, monkeypatch):
+    coupon = make_coupon(max_uses_per_user=3)
+    user = make_user()
+    coupon_crud.redeem_coupon(db, coupon, user.id)
+    db.commit()
+    # a concurrent redemption committed slot 1 after our read
+    monkeypatch.setattr(coupon_crud, "_locked_use_numbers", lambda db, coupon_id, user_id: [])
+    with pytest.raises(ValueError, match="concurrently"):
+        coupon_crud.redeem_coupon(db, coupon, user.id)
+    assert db.query(CouponRedemption).count() == 1
+    db.rollback()
+
+
+def test_slot_follows_the_highest_use_number(db, make_user, make_coupon):
+    coupon = make_coupon()
+    user = make_user()
+    db.add(CouponRedemption(coupon_id=coupon.id, user_id=user.id, use_number=3))
+    db.commit()
+    coupon_crud.redeem_coupon(db, coupon, user.id)
+    db.commit()
+    assert sorted(n for (n,) in db.query(CouponRedemption.use_number)) == [3, 4]
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from app import http_cache
+from app.cache import bump_version, bump_versions, get_version
+from app.crud.product import PRODUCT_CACHE, product_cache
+from app.http_cache import version_cache
+from app.models import CartItem, Coupon
+
+from tests.conftest import auth
+
+
+def _get(client, url, encoding="gzip"):
+    return client.get(url, headers={"Accept-Encoding": encoding})
+
+
+def test_hits_are_served_from_the_cache(client, make_product):
+    product = make_product()
+    url = f"/api/v1/product/product/{product.id}"
+    assert _get(client, url).headers["x-cache"] == "MISS"
+    assert _get(client, url).headers["x-cache"] == "HIT"
+
+
+def test_hits_do_not_read_versions_every_time(client, make_product, monkeypatch):
+    product = make_product()
+    reads = []
+    original = http_cache._read_versions
+    monkeypatch.setattr(http_cache, "_read_versions", lambda names: reads.append(names) or original(names))
+    url = f"/api/v1/product/product/{product.id}"
+    for _ in range(5):
+        _get(client, url)
+    assert len(reads) == 1
+
+
+def test_version_bump_in_another_worker_invalidates(client, db, make_product):
+    product = make_product()
+    url = f"/api/v1/product/product/{product.id}"
+    _get(client, url)
+    # another worker's write: the version moves, but this process's entries aren't purged
+    bump_version(db, PRODUCT_CACHE)
+    db.commit()
+    version_cache.clear()  # as if VERSION_CHECK_SECONDS had passed
+    assert _get(client, url).headers["x-cache"] == "MISS"
+
+
+def test_checkout_invalidates_only_the_ordered_products(client, db, make_user, make_product):
+    user = make_user()
+    sold = make_product(stock=5)
+    other = make_product(stock=5, name="Other")
+    for p in (sold, other):
+        _get(client, f"/api/v1/product/product/{p.id}")
+
+    db.add(CartItem(user_id=user.id, product_id=sold.id, quantity=2))
+    db.commit()
+    assert client.post("/api/orders/orders/checkout", headers=auth(user)).status_code == 200
+
+    assert get_version(db, PRODUCT_CACHE) == 0
+    assert get_version(db, product_cache(sold.id)) == 1
+    response = _get(client, f"/api/v1/product/product/{sold.id}")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json()["stock"] == 3
+    assert _get(client, f"/api/v1/product/product/{other.id}").headers["x-cache"] == "HIT"
+
+
+def test_product_version_bump_in_another_worker_invalidates(client, db, make_product):
+    product = make_product(stock=5)
+    other = make_product(stock=5, name="Other")
+    for p in (product, other):
+        _get(client, f"/api/v1/product/product/{p.id}")
+    # what a checkout in another worker commits
+    bump_versions(db, [product_cache(product.id)])
+    db.commit()
+    version_cache.clear()
+    assert _get(client, f"/api/v1/product/product/{product.id}").headers["x-cache"] == "MISS"
+    assert _get(client, f"/api/v1/product/product/{other.id}").headers["x-cache"] == "HIT"
+
+
+def _many_coupons(db):
+    for i in range(20):
+        db.add(Coupon(
+            code=f"SAVE{i:02d}", description="Ten percent off everything", discount_type="percentage",
+            discount_value=10, valid_to=datetime.utcnow() + timedelta(days=1),
+        ))
+    db.commit()
+
+
+def test_identity_request_does_not_hide_encoded_variant(client, db):
+    # the listing is encoded by CompressionMiddleware, so identity responses carry no Vary
+    _many_coupons(db)
+    assert _get(client, "/api/v1/coupon/", "gzip").headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in _get(client, "/api/v1/coupon/", "identity").headers
+    response = _get(client, "/api/v1/coupon/", "gzip")
+    assert response.headers["x-cache"] == "HIT"
+    assert response.headers["content-encoding"] == "gzip"
+    response = _get(client, "/api/v1/coupon/", "identity")
+    assert response.headers["x-cache"] == "HIT"
+    assert "content-encoding" not in response.headers
+
+
+def test_identity_first_does_not_serve_plain_bytes_to_gzip_clients(client, db):
+    _many_coupons(db)
+    assert "content-encoding" not in _get(client, "/api/v1/coupon/", "identity").headers
+    assert _get(client, "/api/v1/coupon/", "gzip").headers["content-encoding"] == "gzip"
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.idempotency import IN_PROGRESS_LEASE, _path_matches, _sha256
+from app.models import CartItem, Order
+from app.models.idempotency import IdempotencyKey
+from app.models.product import Product
+
+from tests.conftest import auth
+
+
+_headers = {}
+
+
+def _auth(user):
+    # keys are scoped to the Authorization header, so reuse one token per user
+    if user.id not in _headers:
+        _headers[user.id] = auth(user)
+    return _headers[user.id]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_tokens():
+    _headers.clear()
+
+
+def _checkout(client, user, key, body=None):
+    return client.post(
+        "/api/orders/orders/checkout", json=body, headers={**_auth(user), "Idempotency-Key": key},
+    )
+
+
+def _fill_cart(db, user, product, quantity=1):
+    db.add(CartItem(user_id=user.id, product_id=product.id, quantity=quantity))
+    db.commit()
+
+
+def test_repeated_checkout_is_replayed(client, db, make_user, make_product):
+    user = make_user()
+    product = make_product(stock=5)
+    _fill_cart(db, user, product, 2)
+    first = _checkout(client, user, "k1")
+    second = _checkout(client, user, "k1")
+    assert first.status_code == second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+    assert db.query(Order).count() == 1
+    db.expire_all()
+    assert db.get(Product, product.id).stock == 3
+
+
+def test_key_reused_with_a_different_request_is_rejected(client, db, make_user, make_product):
+    user = make_user()
+    _fill_cart(db, user, make_product())
+    assert _checkout(client, user, "k1").status_code == 200
+    assert _checkout(client, user, "k1", {"coupon_code": "OTHER"}).status_code == 422
+
+
+def test_keys_are_scoped_to_the_caller(client, db, make_user, make_product):
+    product = make_product()
+    first, second = make_user("a@example.com"), make_user("b@example.com")
+    for user in (first, second):
+        _fill_cart(db, user, product)
+        response = _checkout(client, user, "same")
+        assert response.status_code == 200
+        assert "idempotent-replayed" not in response.headers
+    assert db.query(Order).count() == 2
+
+
+def test_client_errors_are_replayed_but_not_rerun(client, db, make_user):
+    user = make_user()
+    assert _checkout(client, user, "k1").status_code == 400  # empty cart
+    response = _checkout(client, user, "k1")
+    assert response.status_code == 400
+    assert response.headers["idempotent-replayed"] == "true"
+
+
+def _stored_key(user, key):
+    return _sha256(_auth(user)["Authorization"].encode(), b"POST", b"/api/orders/orders/checkout", key.encode())
+
+
+def test_in_progress_key_is_a_conflict(client, db, make_user, make_product):
+    user = make_user()
+    _fill_cart(db, user, make_product())
+    db.add(IdempotencyKey(
+        key=_stored_key(user, "k1"), request_hash=_sha256(b"", b""),
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    ))
+    db.commit()
+    assert _checkout(client, user, "k1").status_code == 409
+    assert db.query(Order).count() == 0
+
+
+def test_abandoned_key_is_reclaimed_after_the_lease(client, db, make_user, make_product):
+    user = make_user()
+    _fill_cart(db, user, make_product())
+    db.add(IdempotencyKey(
+        key=_stored_key(user, "k1"), request_hash="stale",
+        created_at=datetime.utcnow() - IN_PROGRESS_LEASE - timedelta(seconds=1),
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    ))
+    db.commit()
+    response = _checkout(client, user, "k1")
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+    assert db.query(Order).count() == 1
+
+
+def test_paths_match_by_segment():
+    prefixes = ("/api/orders", "/cart")
+    assert _path_matches("/cart", prefixes)
+    assert _path_matches("/cart/12", prefixes)
+    assert _path_matches("/api/orders/orders/checkout", prefixes)
+    assert not _path_matches("/cartoons", prefixes)
+    assert not _path_matches("/api/ordersx", prefixes)
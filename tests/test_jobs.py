@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import jobs
+from app.models.job import Job
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Register test handlers without leaking them into other tests."""
+    monkeypatch.setattr(jobs, "_handlers", {})
+    monkeypatch.setattr(jobs, "_failure_handlers", {})
+    return jobs.job_handler
+
+
+def test_due_job_is_claimed_once(db, handlers):
+    handlers("noop")(lambda db, payload, progress: None)
+    job = jobs.enqueue(db, "noop")
+    assert jobs.claim_job("w1") == job.id
+    assert jobs.claim_job("w2") is None
+    db.expire_all()
+    claimed = db.get(Job, job.id)
+    assert (claimed.status, claimed.locked_by, claimed.attempts) == ("running", "w1", 1)
+
+
+def test_concurrent_workers_never_share_a_job(db, handlers):
+    handlers("noop")(lambda db, payload, progress: None)
+    ids = {jobs.enqueue(db, "noop").id for _ in range(5)}
+    claims = []
+    lock = threading.Lock()
+
+    def work(n):
+        while True:
+            job_id = jobs.claim_job(f"w{n}")
+            if job_id is None:
+                return
+            with lock:
+                claims.append(job_id)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claims) == sorted(ids)
+
+
+def test_future_job_is_not_claimed(db, handlers):
+    handlers("noop")(lambda db, payload, progress: None)
+    jobs.enqueue(db, "noop", delay_seconds=60)
+    assert jobs.claim_job("w1") is None
+
+
+def test_success_stores_the_result(db, handlers):
+    handlers("echo")(lambda db, payload, progress: {"got": payload["x"]})
+    job = jobs.enqueue(db, "echo", {"x": 1})
+    jobs.run_job(jobs.claim_job("w1"))
+    db.expire_all()
+    done = db.get(Job, job.id)
+    assert (done.status, done.result, done.progress) == ("succeeded", {"got": 1}, 1.0)
+
+
+def test_failure_is_retried_then_cleaned_up(db, handlers):
+    cleaned = []
+
+    @handlers("boom", on_failure=cleaned.append)
+    def boom(db, payload, progress):
+        raise RuntimeError("nope")
+
+    job = jobs.enqueue(db, "boom", {"path": "/tmp/x"}, max_attempts=2)
+    jobs.run_job(jobs.claim_job("w1"))
+    db.expire_all()
+    retried = db.get(Job, job.id)
+    assert retried.status == "queued" and retried.run_after > datetime.utcnow()
+    assert cleaned == []
+
+    retried.run_after = datetime.utcnow()
+    db.commit()
+    jobs.run_job(jobs.claim_job("w1"))
+    db.expire_all()
+    failed = db.get(Job, job.id)
+    assert failed.status == "failed" and "nope" in failed.error
+    assert cleaned == [{"path": "/tmp/x"}]
+
+
+def test_stale_running_jobs_are_requeued_or_failed(db, handlers):
+    cleaned = []
+    handlers("noop", on_failure=cleaned.append)(lambda db, payload, progress: None)
+    stale_at = datetime.utcnow() - jobs.LOCK_TIMEOUT - timedelta(seconds=1)
+    retry = Job(kind="noop", payload={}, status="running", attempts=1, max_attempts=3, locked_at=stale_at)
+    spent = Job(kind="noop", payload={"n": 2}, status="running", attempts=3, max_attempts=3, locked_at=stale_at)
+    fresh = Job(kind="noop", payload={}, status="running", attempts=1, max_attempts=3, locked_at=datetime.utcnow())
+    db.add_all([retry, spent, fresh])
+    db.commit()
+
+    assert jobs.requeue_stale_jobs(db) == 2
+    db.expire_all()
+    assert [db.get(Job, j.id).status for j in (retry, spent, fresh)] == ["queued", "failed", "running"]
+    assert cleaned == [{"n": 2}]
+    assert jobs.claim_job("w1") == retry.id
@@ -0,0 +1,79 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.models import Order
+
+from tests.conftest import auth
+
+
+@pytest.fixture
+def order(db, make_user):
+    owner = make_user("owner@example.com")
+    order = Order(user_id=owner.id)
+    db.add(order)
+    db.commit()
+    return order
+
+
+def _add(client, order_id, headers):
+    return client.post(f"/api/orders/orders/{order_id}/tracking?status=shipped&message=m", headers=headers)
+
+
+def test_anonymous_cannot_add_tracking(client, order):
+    assert _add(client, order.id, {}).status_code == 401
+
+
+def test_customer_cannot_add_tracking(client, order, make_user):
+    assert _add(client, order.id, auth(make_user("other@example.com"))).status_code == 403
+
+
+def test_admin_can_add_tracking(client, order, make_user):
+    assert _add(client, order.id, auth(make_user("admin@example.com", "admin"))).status_code == 200
+
+
+def test_carrier_token_can_add_tracking(client, order, monkeypatch):
+    monkeypatch.setenv("CARRIER_WEBHOOK_TOKEN", "secret")
+    assert _add(client, order.id, {"X-Carrier-Token": "wrong"}).status_code == 401
+    assert _add(client, order.id, {"X-Carrier-Token": "secret"}).status_code == 200
+
+
+def test_tracking_socket_requires_owner(client, order, make_user):
+    with pytest.raises(WebSocketDisconnect) as e:
+        with client.websocket_connect(f"/api/orders/orders/{order.id}/tracking/ws") as ws:
+            ws.receive_json()
+    assert e.value.code == 4401
+    with pytest.raises(WebSocketDisconnect) as e:
+        with client.websocket_connect(
+            f"/api/orders/orders/{order.id}/tracking/ws", headers=auth(make_user("other@example.com")),
+        ) as ws:
+            ws.receive_json()
+    assert e.value.code == 4404
+
+
+def test_tracking_socket_delivers_to_owner(client, db, order, make_user):
+    admin = make_user("admin@example.com", "admin")
+    _add(client, order.id, auth(admin))
+    owner_headers = {"Authorization": auth(db.get(type(order), order.id).user)["Authorization"]}
+    with client.websocket_connect(f"/api/orders/orders/{order.id}/tracking/ws", headers=owner_headers) as ws:
+        assert ws.receive_json()["status"] == "shipped"
+        _add(client, order.id, auth(admin))
+        assert ws.receive_json()["status"] == "shipped"
+
+
+def test_tracking_stream_requires_owner(client, order, make_user):
+    url = f"/api/orders/orders/{order.id}/tracking/stream"
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth(make_user("other@example.com"))).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/api/orders/orders/{id}/tracking", "/api/orders/orders/api/v1/product/{id}/tracking"])
+def test_tracking_poll_requires_owner(client, db, order, make_user, path):
+    url = path.format(id=order.id)
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth(make_user("other@example.com"))).status_code == 404
+    owner = db.get(type(order), order.id).user
+    response = client.get(url, headers=auth(owner))
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get(url, headers={**auth(owner), "If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers=auth(make_user("admin@example.com", "admin"))).status_code == 200
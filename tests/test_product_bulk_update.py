@@ -0,0 +1,50 @@
+import pytest
+
+from app.models.product import Product
+
+from tests.conftest import auth
+
+
+@pytest.fixture
+def admin_headers(make_user):
+    return auth(make_user("admin@example.com", "admin"))
+
+
+def _patch(client, headers, **body):
+    return client.patch("/api/v1/product/bulk", json=body, headers=headers)
+
+
+def test_discount_at_or_above_given_price_is_rejected(client, admin_headers, make_product):
+    product = make_product(price=10)
+    assert _patch(client, admin_headers, ids=[product.id], price=10, discount_price=10).status_code == 422
+    assert _patch(client, admin_headers, ids=[product.id], price=10, discount_price=12).status_code == 422
+    assert _patch(client, admin_headers, ids=[product.id], discount_percent=0).status_code == 422
+
+
+def test_discount_is_only_applied_below_each_rows_price(client, db, admin_headers, make_product):
+    cheap = make_product(price=5)
+    dear = make_product(price=50)
+    response = _patch(client, admin_headers, ids=[cheap.id, dear.id], discount_price=20)
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1, "ids": [dear.id], "skipped": [cheap.id]}
+    db.expire_all()
+    assert not db.get(Product, cheap.id).discount_price
+    assert db.get(Product, dear.id).discount_price == 20
+
+
+def test_price_is_not_lowered_under_an_existing_discount(client, db, admin_headers, make_product):
+    on_sale = make_product(price=50, discount_price=30)
+    plain = make_product(price=50)
+    response = _patch(client, admin_headers, ids=[on_sale.id, plain.id], price=25)
+    assert response.json() == {"updated": 1, "ids": [plain.id], "skipped": [on_sale.id]}
+    db.expire_all()
+    assert db.get(Product, on_sale.id).price == 50
+
+
+def test_discount_percent_reprices_from_each_rows_price(client, db, admin_headers, make_product):
+    a = make_product(price=10)
+    b = make_product(price=40)
+    response = _patch(client, admin_headers, ids=[a.id, b.id], discount_percent=25)
+    assert response.json()["updated"] == 2
+    db.expire_all()
+    assert (db.get(Product, a.id).discount_price, db.get(Product, b.id).discount_price) == (7.5, 30)